@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+Compara a decodificação de datas ddmmaaaa por datetime.strptime (forma
+anterior de CampoData.get e CampoData.formatar) com CampoData.decodificar,
+CampoData.formatar e a conversão de uma coluna para numpy.datetime64.
+
+Uso:
+    python benchmarks/benchmark_datas.py [numero_de_valores] [datas_distintas]
+"""
+
+import os
+import sys
+import timeit
+from datetime import date
+from datetime import datetime
+from datetime import timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from sped.campos import CampoData
+
+
+def main():
+    numero_de_valores = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    distintas = int(sys.argv[2]) if len(sys.argv) > 2 else 366
+
+    inicio = date(2019, 1, 1)
+    datas = [(inicio + timedelta(days=i % distintas)).strftime('%d%m%Y')
+             for i in range(numero_de_valores)]
+    campo = CampoData(2, 'DT_DOC')
+
+    casos = [
+        ('strptime().date()', lambda: [datetime.strptime(d, '%d%m%Y').date() for d in datas]),
+        ('CampoData.decodificar', lambda: [CampoData.decodificar(d) for d in datas]),
+        ('strptime().strftime()', lambda: [datetime.strptime(d, '%d%m%Y').strftime('%d/%m/%Y')
+                                           for d in datas]),
+        ('CampoData.formatar', lambda: [CampoData.formatar(d) for d in datas]),
+        ('decodificar_coluna', lambda: campo.decodificar_coluna(datas)),
+    ]
+    try:
+        import numpy # noqa: F401
+        casos.append(('decodificar_coluna numpy', lambda: campo.decodificar_coluna(datas, 'numpy')))
+    except ImportError:
+        pass
+
+    for nome, funcao in casos:
+        segundos = min(timeit.repeat(funcao, number=1, repeat=3))
+        print('%-26s %8.3f s  %8.0f ns/valor' % (nome, segundos, segundos / numero_de_valores * 1e9))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+Mede o tempo de importação dos módulos de sped, cada um em um novo processo
+(python -X importtime), como na inicialização de efd_relatorios ou de um
+processo da leitura em paralelo, e verifica que cada módulo não carrega
+módulos pesados que não usa (leiautes, registros de outra EFD, pandas, ...).
+
+Uso:
+    python benchmarks/benchmark_importacao.py [repeticoes]
+
+Termina com código 1 se algum módulo não permitido for carregado.
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+
+RAIZ = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# Módulo importado -> módulos que não devem ser carregados por ele.
+NAO_CARREGAR = {
+    'sped': ['sped.escrituracao', 'sped.campos', 'sped.arquivos'],
+    'sped.arquivos': ['sped.escrituracao', 'multiprocessing', 'zipfile', 'gzip', 'lzma',
+                      'numpy', 'pandas'],
+    'sped.efd.pis_cofins.arquivos': ['sped.escrituracao', 'sped.efd.icms_ipi.registros',
+                                     'multiprocessing', 'numpy', 'pandas'],
+    'sped.efd.icms_ipi.arquivos': ['sped.escrituracao', 'sped.efd.pis_cofins.registros',
+                                   'multiprocessing', 'numpy', 'pandas'],
+    'sped.ecd.arquivos': ['sped.escrituracao', 'multiprocessing'],
+    'sped.relatorios.efd_relatorios': ['numpy', 'pandas', 'psutil', 'xlsxwriter',
+                                       'sped.efd.pis_cofins.registros',
+                                       'sped.efd.icms_ipi.registros'],
+}
+
+
+def importar(modulo):
+    """
+    Importa modulo em um novo processo. Retorna (microssegundos, módulos
+    carregados) ou (None, mensagem de erro).
+    """
+    codigo = 'import sys, %s; print("\\n".join(sys.modules))' % modulo
+    resultado = subprocess.run([sys.executable, '-X', 'importtime', '-c', codigo], cwd=RAIZ,
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               universal_newlines=True)
+    if resultado.returncode != 0:
+        return None, resultado.stderr.strip().splitlines()[-1]
+    # Soma das importações de primeiro nível feitas após o módulo site (as
+    # anteriores são as da inicialização do interpretador).
+    microssegundos = 0
+    contar = False
+    for linha in resultado.stderr.splitlines():
+        if not linha.startswith('import time:') or 'cumulative' in linha:
+            continue
+        _, cumulativo, nome = linha.split('|')
+        if nome.startswith('  '): # importação de segundo nível em diante
+            continue
+        if contar:
+            microssegundos += int(cumulativo)
+        contar = contar or nome.strip() == 'site'
+    return microssegundos, set(resultado.stdout.split())
+
+
+def main():
+    repeticoes = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    falhas = 0
+    for modulo, nao_carregar in NAO_CARREGAR.items():
+        tempos = []
+        for _ in range(repeticoes):
+            microssegundos, carregados = importar(modulo)
+            if microssegundos is None:
+                break
+            tempos.append(microssegundos)
+        if not tempos:
+            print('%-32s não importado: %s' % (modulo, carregados))
+            continue
+        indevidos = sorted(m for m in nao_carregar if m in carregados)
+        falhas += bool(indevidos)
+        print('%-32s %8.1f ms (mediana de %d)%s' % (
+            modulo, statistics.median(tempos) / 1000, len(tempos),
+            '  CARREGOU: ' + ', '.join(indevidos) if indevidos else ''))
+    sys.exit(1 if falhas else 0)
+
+
+if __name__ == '__main__':
+    main()
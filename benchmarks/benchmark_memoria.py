@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+Mede a memória ocupada por registro (bytes por registro) após a leitura
+de um arquivo SPED EFD Contribuições, em cada modo de leitura, com e sem a
+internação dos valores repetidos (internar=True).
+
+Em seguida, mostra os campos internados (ver sped.arquivos.INTERNAR) com mais
+ocorrências: valores distintos e a memória ocupada pelas strings sem e com
+a internação.
+
+Uso:
+    python benchmarks/benchmark_memoria.py [arquivo] [numero_de_linhas]
+
+Sem arquivo, um EFD sintético é gerado em um diretório temporário.
+"""
+
+import gc
+import os
+import sys
+import tempfile
+import tracemalloc
+from collections import defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from gerar_efd import gerar_arquivo
+from sped.arquivos import INTERNAR
+from sped.arquivos import InternacaoDeValores
+from sped.efd.pis_cofins.arquivos import ArquivoDigital
+
+
+def medir(caminho, **opcoes):
+    gc.collect()
+    tracemalloc.start()
+    inicio, _ = tracemalloc.get_traced_memory()
+    registros = list(ArquivoDigital().iter_registros(caminho, **opcoes))
+    gc.collect()
+    fim, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return len(registros), fim - inicio
+
+
+def relatorio_por_campo(caminho, quantidade=12):
+    """Memória das strings dos campos internados: (campo, ocorrências, distintos, sem, com)."""
+    arquivo = ArquivoDigital()
+    internados = InternacaoDeValores(arquivo._tabela_de_despacho(), INTERNAR)._indices
+    ocorrencias = defaultdict(int)
+    sem_internacao = defaultdict(int)
+    distintos = defaultdict(dict)
+    for registro in arquivo.iter_registros(caminho):
+        for indice in internados.get(registro.valores[1], ()):
+            nome = registro._campos_por_indice[indice].nome
+            valor = registro.valores[indice]
+            ocorrencias[nome] += 1
+            sem_internacao[nome] += sys.getsizeof(valor)
+            distintos[nome][valor] = sys.getsizeof(valor)
+    linhas = [(nome, ocorrencias[nome], len(distintos[nome]), sem_internacao[nome],
+               sum(distintos[nome].values())) for nome in ocorrencias]
+    linhas.sort(key=lambda linha: linha[3] - linha[4], reverse=True)
+    return linhas[:quantidade]
+
+
+def main():
+    if len(sys.argv) > 1 and os.path.isfile(sys.argv[1]):
+        caminho = sys.argv[1]
+    else:
+        numero_de_linhas = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+        caminho = os.path.join(tempfile.mkdtemp(), 'efd_sintetica.txt')
+        gerar_arquivo(caminho, numero_de_linhas)
+
+    modos = [
+        ('texto', {}),
+        ('texto+internar', {'internar': True}),
+        ('rapido', {'rapido': True}),
+        ('rapido+internar', {'rapido': True, 'internar': True}),
+        ('compacto', {'compacto': True}),
+    ]
+    for nome, opcoes in modos:
+        quantidade, memoria = medir(caminho, **opcoes)
+        print('%-16s %10d registros: %8.1f bytes/registro  %8.1f MiB'
+              % (nome, quantidade, memoria / quantidade, memoria / 2 ** 20))
+
+    print()
+    print('%-12s %12s %10s %14s %14s' % ('campo', 'ocorrências', 'distintos', 'sem (MiB)', 'com (MiB)'))
+    for nome, ocorrencias, distintos, sem, com in relatorio_por_campo(caminho):
+        print('%-12s %12d %10d %14.2f %14.2f' % (nome, ocorrencias, distintos, sem / 2 ** 20, com / 2 ** 20))
+
+
+if __name__ == '__main__':
+    main()
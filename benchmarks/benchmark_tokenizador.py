@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""
+Compara a leitura de um arquivo SPED EFD Contribuições em modo texto
+(readfile padrão) com o modo rapido (sped.tokenizador), em linhas por segundo.
+
+Uso:
+    python benchmarks/benchmark_tokenizador.py [arquivo] [numero_de_linhas]
+
+Sem arquivo, um EFD sintético é gerado em um diretório temporário.
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from gerar_efd import gerar_arquivo
+from sped.efd.pis_cofins.arquivos import ArquivoDigital
+
+
+def medir(caminho, **opcoes):
+    arquivo = ArquivoDigital()
+    inicio = time.perf_counter()
+    linhas = 0
+    for _ in arquivo.iter_registros(caminho, **opcoes):
+        linhas += 1
+    return linhas, time.perf_counter() - inicio
+
+
+def main():
+    if len(sys.argv) > 1 and os.path.isfile(sys.argv[1]):
+        caminho = sys.argv[1]
+    else:
+        numero_de_linhas = int(sys.argv[1]) if len(sys.argv) > 1 else 2000000
+        caminho = os.path.join(tempfile.mkdtemp(), 'efd_sintetica.txt')
+        gerar_arquivo(caminho, numero_de_linhas)
+
+    for nome, opcoes in [('texto', {}), ('rapido', {'rapido': True})]:
+        linhas, segundos = medir(caminho, **opcoes)
+        print('%-8s %10d linhas em %7.2f s: %10.0f linhas/s' % (nome, linhas, segundos, linhas / segundos))
+
+
+if __name__ == '__main__':
+    main()
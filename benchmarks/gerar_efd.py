@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""
+Gera um arquivo sintético de SPED EFD Contribuições com aproximadamente
+o número de linhas pedido, para uso nos benchmarks.
+
+Uso:
+    python benchmarks/gerar_efd.py efd_sintetica.txt 2000000
+"""
+
+import sys
+
+ITENS_POR_NOTA = 8
+PARTICIPANTES = 300
+PRODUTOS = 2000
+
+
+def gerar_linhas(numero_de_linhas):
+    yield '|0000|006|0|||01012019|31012019|EMPRESA SINTÉTICA LTDA|11111111000191|SP|3550308||00|0|'
+    yield '|0001|0|'
+    yield '|0140||EMPRESA SINTÉTICA LTDA|11111111000191|SP||3550308|||'
+    for i in range(PARTICIPANTES):
+        yield '|0150|P%05d|FORNECEDOR Nº %d|01058|11111111000191|||3550308||RUA DAS FLORES|%d||CENTRO|' % (i, i, i)
+    for i in range(PRODUTOS):
+        yield '|0200|ITEM%05d|PRODUTO DE REVENDA Nº %d||||00|22030000||||18,00|' % (i, i)
+    yield '|0990|%d|' % (PARTICIPANTES + PRODUTOS + 4)
+    yield '|C001|0|'
+    yield '|C010|11111111000191|2|'
+
+    corpo = numero_de_linhas - PARTICIPANTES - PRODUTOS - 20
+    notas = max(1, corpo // (ITENS_POR_NOTA + 1))
+    for n in range(notas):
+        dia = n % 28 + 1
+        yield ('|C100|0|1|P%05d|55|00|1|%d|35190111111111000191550010000000011000000010|%02d012019|%02d012019|'
+               '1234,56|0|0,00|0,00|1234,56|9|0,00|0,00|0,00|1234,56|222,22|0,00|0,00|0,00|20,37|93,83|0,00|0,00|'
+               % (n % PARTICIPANTES, n + 1, dia, dia))
+        for i in range(ITENS_POR_NOTA):
+            yield ('|C170|%d|ITEM%05d|DESCRIÇÃO COMPLEMENTAR|10,00000|UN|154,32|0,00|0|000|1102|||154,32|18,00|27,78|'
+                   '0,00|0,00|0,00|0|||0,00|0,00|0,00|50|154,32|1,6500|||2,55|50|154,32|7,6000|||11,73|3.01.01.01|'
+                   % (i + 1, (n * ITENS_POR_NOTA + i) % PRODUTOS))
+    yield '|C990|%d|' % (notas * (ITENS_POR_NOTA + 1) + 3)
+    yield '|9001|0|'
+    yield '|9900|0000|1|'
+    yield '|9990|3|'
+    yield '|9999|%d|' % numero_de_linhas
+
+
+def gerar_arquivo(caminho, numero_de_linhas, codificacao='utf-8'):
+    with open(caminho, 'w', encoding=codificacao, newline='') as arquivo:
+        for linha in gerar_linhas(numero_de_linhas):
+            arquivo.write(linha + '\r\n')
+
+
+if __name__ == '__main__':
+    gerar_arquivo(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 1000000)
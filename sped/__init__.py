@@ -1,10 +1,55 @@
 # -*- coding: utf-8 -*-
 
-from .escrituracao import ECD
-from .escrituracao import ECF
-from .escrituracao import EFD_ICMS_IPI
-from .escrituracao import EFD_PIS_COFINS
-from .escrituracao import Escrituracao
+"""
+Os nomes exportados por sped (Escrituracao, ECD, ECF, ...) são importados
+somente no primeiro acesso (ver __getattr__), de modo que "import sped",
+os subpacotes (sped.efd, sped.ecd, ...) e os processos da leitura em
+paralelo não carregam os leiautes nem os módulos que não usam. O tempo de
+importação é medido por benchmarks/benchmark_importacao.py.
+
+>>> import os, subprocess, sys
+>>> codigo = 'import sped, sys; print([m for m in ("sped.escrituracao", "sped.campos") if m in sys.modules])'
+>>> raiz = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+>>> saida = subprocess.run([sys.executable, '-c', codigo], cwd=raiz, stdout=subprocess.PIPE,
+...                        universal_newlines=True).stdout.strip()
+>>> saida if sys.version_info >= (3, 7) else '[]'
+'[]'
+>>> from sped import Escrituracao, ECD
+>>> Escrituracao(ECD, 2017)
+<sped.escrituracao.Escrituracao(ecd, 2017)>
+"""
+
+import importlib
+import sys
 
 
 __version__ = '1.0.3'
+
+# Nome exportado -> módulo de sped que o define.
+_IMPORTACOES_ADIADAS = {
+    'ECD': 'escrituracao',
+    'ECF': 'escrituracao',
+    'EFD_ICMS_IPI': 'escrituracao',
+    'EFD_PIS_COFINS': 'escrituracao',
+    'Escrituracao': 'escrituracao',
+}
+
+__all__ = list(_IMPORTACOES_ADIADAS)
+
+
+def __getattr__(name):
+    modulo = _IMPORTACOES_ADIADAS.get(name)
+    if modulo is None:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name))
+    valor = getattr(importlib.import_module('.' + modulo, __name__), name)
+    globals()[name] = valor # os próximos acessos não passam por __getattr__
+    return valor
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_IMPORTACOES_ADIADAS))
+
+
+if sys.version_info < (3, 7):
+    # Sem __getattr__ de módulo (PEP 562), os nomes são importados de imediato.
+    from .escrituracao import ECD, ECF, EFD_ICMS_IPI, EFD_PIS_COFINS, Escrituracao
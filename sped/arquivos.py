@@ -1,10 +1,234 @@
 # -*- coding: utf-8 -*-
 
+import os
 import re
 from collections import OrderedDict
+from collections import deque
 from io import StringIO
 
+from .campos import CampoData
+from .campos import CampoFixo
+from .codificacao import detectar_codificacao
+from .compressao import abrir_binario
+from .compressao import abrir_texto
+from .compressao import compactado
+from .colunar import ColunasDoArquivo
+from .registros import Registro
 from .registros import RegistroIndefinido
+from .tokenizador import ler_linhas
+from .tokenizador import registrar_numero_de_linhas
+from .tokenizador import tokenizar
+
+_espacos = re.compile(r'\s{2,}')
+
+# Papel de cada registro na montagem do arquivo digital (ver ArquivoDigital._tabela_de_despacho).
+REGISTRO = 0
+ABERTURA_DO_ARQUIVO = 1
+ENCERRAMENTO_DO_ARQUIVO = 2
+ABERTURA_DO_BLOCO = 3
+ENCERRAMENTO_DO_BLOCO = 4
+
+class ContextoDeLeitura(object):
+    """
+    Estado de uma leitura de arquivo SPED, como o número da linha corrente.
+
+    Cada leitura tem o seu próprio contexto, de modo que vários arquivos podem
+    ser lidos ao mesmo tempo (em threads, por exemplo) sem que a numeração das
+    linhas de um interfira na do outro.
+
+    >>> contexto = ContextoDeLeitura('arquivo.txt')
+    >>> contexto.proxima_linha(), contexto.proxima_linha()
+    (1, 2)
+    >>> contexto.reiniciar()
+    >>> contexto.proxima_linha()
+    1
+    """
+
+    def __init__(self, filename=None):
+        self.filename = filename
+        self.numero_da_linha = 0
+        # Linhas descartadas antes da criação dos registros (ver FiltroDeLinhas).
+        self.linhas_descartadas = 0
+
+    def __repr__(self):
+        return '<%s.%s(%s, linha %s)>' % (self.__class__.__module__, self.__class__.__name__,
+                                         self.filename, self.numero_da_linha)
+
+    def proxima_linha(self):
+        self.numero_da_linha += 1
+        return self.numero_da_linha
+
+    def reiniciar(self):
+        self.numero_da_linha = 0
+
+
+class FiltroDeLinhas(object):
+    """
+    Seleciona as linhas de um arquivo SPED pelo prefixo, antes que elas sejam
+    separadas em campos: pelo bloco e/ou pelo código do registro (REG).
+    Aceita linhas em str ou em bytes.
+
+    Os registros essenciais (abertura e encerramento do arquivo) são sempre
+    aceitos, assim como linhas que não começam com '|', que seguem para a
+    leitura normal.
+
+    >>> filtro = FiltroDeLinhas({'C'}, essenciais=('0000', '9999'))
+    >>> filtro('|C100|0|'), filtro(b'|c170|1|'), filtro('|D100|0|')
+    (True, True, False)
+    >>> filtro(b'|0000|006|'), filtro('|0150|1|'), filtro('|9999|10|')
+    (True, False, True)
+    >>> filtro = FiltroDeLinhas(registros={'0150', 'C170'})
+    >>> filtro('|0150|1|'), filtro(b'|C170|1|'), filtro('|C100|0|')
+    (True, True, False)
+    """
+
+    def __init__(self, blocos=(), essenciais=(), registros=()):
+        self.blocos = _str_e_bytes(blocos)
+        # Os registros selecionados são tratados como essenciais: em ambos os
+        # casos a linha é aceita pelo código do registro.
+        self.essenciais = _str_e_bytes(essenciais) | _str_e_bytes(registros)
+
+    def __call__(self, linha):
+        if linha[:1] not in ('|', b'|'):
+            return True
+        if linha[1:2].upper() in self.blocos:
+            return True
+        return linha[1:5].upper() in self.essenciais and linha[5:6] in ('|', b'|')
+
+
+class ProjecaoDeCampos(object):
+    """
+    Seleciona os campos guardados de cada registro: os demais campos da linha
+    não são separados nem normalizados e ficam vazios no Registro.
+
+    campos é um conjunto de nomes de campos, aplicado a todos os registros,
+    ou um dicionário REG -> nomes dos campos (os registros ausentes do
+    dicionário são lidos por completo). Os campos fixos (como o REG) são
+    sempre guardados. A lista de valores tem o tamanho declarado pela classe
+    do registro, de modo que os índices dos campos não mudam.
+
+    >>> from sped.campos import CampoAlfanumerico, CampoFixo, CampoNumerico
+    >>> class RegistroC170(Registro):
+    ...     campos = [CampoFixo(1, 'REG', 'C170'), CampoAlfanumerico(2, 'NUM_ITEM'),
+    ...               CampoAlfanumerico(3, 'DESCR_COMPL'), CampoNumerico(4, 'VL_ITEM')]
+    >>> projecao = ProjecaoDeCampos({'VL_ITEM'}, {'C170': (RegistroC170, 'C', 0)})
+    >>> projecao.selecao('C170')
+    ((1, 4), 4, 6)
+    >>> projecao('C170', '|C170|1|  PRODUTO   X |10,00|\\r'.split('|'))
+    ['', 'C170', '', '', '10,00', '']
+    >>> projecao.separar('|c170|1|  PRODUTO   X |10,00|\\r\\n')
+    ('C170', ['', 'C170', '', '', '10,00', ''])
+    >>> projecao.separar('|0000|EMPRESA|') is None # registro não selecionado
+    True
+    """
+
+    def __init__(self, campos, despacho):
+        self._selecao = {}
+        for reg_id, (registro_class, _, _) in despacho.items():
+            nomes = campos.get(reg_id) if isinstance(campos, dict) else campos
+            if nomes is None:
+                continue
+            nomes = set(nomes)
+            indices = sorted(set(c.indice for c in registro_class.campos
+                                 if c.nome in nomes or isinstance(c, CampoFixo)) | {1})
+            # (índices guardados, maior índice guardado, tamanho da lista de valores)
+            self._selecao[reg_id] = (tuple(indices), indices[-1], len(registro_class.campos) + 2)
+
+    def selecao(self, reg_id):
+        return self._selecao.get(reg_id)
+
+    def __call__(self, reg_id, campos):
+        """Projeta os campos (str ou bytes) já separados de uma linha."""
+        selecao = self._selecao.get(reg_id)
+        if selecao is None:
+            return campos
+        indices, _, tamanho = selecao
+        vazio = campos[0][:0]
+        valores = [vazio] * max(tamanho, indices[-1] + 1)
+        for indice in indices:
+            if indice < len(campos):
+                valores[indice] = campos[indice]
+        return valores
+
+    def separar(self, line):
+        """
+        Separa uma linha (str) em (reg_id, valores), normalizando apenas os
+        campos selecionados. Retorna None se o registro não tiver projeção.
+        """
+        fim = line.find('|', 1)
+        reg_id = _espacos.sub(' ', line[1:fim]).strip().upper()
+        selecao = self._selecao.get(reg_id)
+        if selecao is None:
+            return None
+        indices, maior, tamanho = selecao
+        # Separar somente até o maior campo selecionado: o final da linha é descartado.
+        campos = line.split('|', maior + 1)
+        valores = [''] * max(tamanho, maior + 1)
+        valores[1] = reg_id
+        for indice in indices[1:]:
+            if indice < len(campos):
+                valores[indice] = _espacos.sub(' ', campos[indice]).strip()
+        return reg_id, valores
+
+
+# Tipos e nomes dos campos cujos valores mais se repetem nos arquivos SPED
+# (ver InternacaoDeValores): códigos de registro, datas, CST, CFOP, códigos de
+# participantes, itens e contas, unidades, alíquotas e indicadores.
+INTERNAR = (
+    CampoFixo, CampoData,
+    'CST_PIS', 'CST_COFINS', 'CST_ICMS', 'CST_IPI', 'CFOP', 'COD_PART', 'COD_ITEM',
+    'UNID', 'COD_CTA', 'COD_NAT', 'COD_MOD', 'COD_SIT', 'SER', 'IND_OPER', 'IND_EMIT',
+    'IND_PGTO', 'IND_FRT', 'IND_MOV', 'ALIQ_PIS', 'ALIQ_COFINS', 'ALIQ_ICMS', 'NAT_BC_CRED',
+)
+
+
+class InternacaoDeValores(object):
+    """
+    Faz com que valores iguais de certos campos sejam o mesmo objeto str em
+    todos os registros lidos, em vez de uma cópia por linha.
+
+    internar é uma sequência de tipos de campo (subclasses de Campo) e/ou de
+    nomes de campos. A internação vale para uma leitura: os valores distintos
+    ficam em self.valores, que deixa de existir com o fim da leitura.
+
+    >>> from sped.campos import CampoAlfanumerico
+    >>> class Registro0150(Registro):
+    ...     campos = [CampoFixo(1, 'REG', '0150'), CampoAlfanumerico(2, 'COD_PART'),
+    ...               CampoAlfanumerico(3, 'NOME')]
+    >>> internacao = InternacaoDeValores({'0150': (Registro0150, '0', 0)}, (CampoFixo, 'COD_PART'))
+    >>> a, b = '|0150|P1|A|'.split('|'), '|0150|P1|B|'.split('|')
+    >>> internacao('0150', a); internacao('0150', b)
+    >>> a[1] is b[1], a[2] is b[2], sorted(internacao.valores)
+    (True, True, ['0150', 'P1'])
+    """
+
+    def __init__(self, despacho, internar=INTERNAR):
+        tipos = tuple(item for item in internar if isinstance(item, type))
+        nomes = set(item for item in internar if isinstance(item, str))
+        self._indices = {}
+        for reg_id, (registro_class, _, _) in despacho.items():
+            indices = tuple(c.indice for c in registro_class.campos
+                            if c.nome in nomes or isinstance(c, tipos))
+            if indices:
+                self._indices[reg_id] = indices
+        self.valores = {}
+
+    def __call__(self, reg_id, valores):
+        indices = self._indices.get(reg_id)
+        if indices is None:
+            return
+        unicos = self.valores
+        quantidade = len(valores)
+        for indice in indices:
+            if indice < quantidade:
+                valor = valores[indice]
+                valores[indice] = unicos.setdefault(valor, valor)
+
+
+def _str_e_bytes(valores):
+    valores = set(valor.upper() for valor in valores)
+    return frozenset(valores) | frozenset(valor.encode('ascii') for valor in valores)
+
 
 class ArquivoDigital(object):
     registros = None
@@ -18,51 +242,328 @@ class ArquivoDigital(object):
         self._registro_encerramento = self.registro_encerramento()
         self._blocos = OrderedDict()
         self.leitura_completa = False
+        # Contexto da leitura corrente (readfile) ou das chamadas a read_registro.
+        self.contexto = ContextoDeLeitura()
 
-    def readfile(self, filename, codificacao=None, verbose=None):
-        if codificacao is None: # 'utf-8', 'latin-1', ...
-            codificacao = 'utf-8'
-        with open(filename, 'r', encoding=codificacao, errors='ignore') as spedfile:
-            for line in [line.strip() for line in spedfile]:
-                # A simple way to remove multiple spaces in a string
-                line = re.sub(r'\s{2,}', ' ', line)
-                # Em algumas EFDs foram encontrados registros digitados incorretamente em minúsculo.
-                # Por exemplo, o registro 'c491' deve ser corrigido para 'C491'.
-                line = line[:6].upper() + line[6:] # line = '|c491|...' --> '|C491|...'
-                self.read_registro(line)
-                # Verificar se o arquivo SPED foi lido até a última linha válida que contém o registro '9999'.
-                if self.leitura_completa:
-                    break
+    def readfile(self, filename, codificacao=None, verbose=None, rapido=False, compacto=False,
+                 processos=None, blocos=None, registros=None, predicado=None, campos=None,
+                 internar=None):
+        """
+        Lê o arquivo SPED e distribui os registros em seus blocos.
+
+        filename pode ser um arquivo compactado (.zip, .gz ou .xz) ou um arquivo
+        de dentro de um .zip ('arquivos.zip/PISCOFINS.txt'): o conteúdo é
+        descompactado à medida que é lido (ver sped.compressao).
+
+        Com codificacao='auto', a codificação (UTF-8 ou Latin-1) é detectada
+        por sped.codificacao, que memoriza o resultado para cada arquivo.
+
+        Com processos > 1, o arquivo é dividido em intervalos de bytes alinhados
+        ao final das linhas e cada intervalo é lido e separado em campos por um
+        processo de um multiprocessing.Pool. Os registros são montados na ordem
+        do arquivo, de modo que numero_da_linha é o mesmo da leitura sequencial.
+        Apenas alguns intervalos por processo ficam pendentes de cada vez (ver
+        _tokenizar_em_paralelo). A transferência dos campos entre processos tem
+        custo próprio: a leitura em paralelo só compensa com vários núcleos.
+
+        Com blocos (por exemplo, {'0', 'A', 'C', 'D', 'F'}), as linhas dos
+        demais blocos são descartadas pelo seu prefixo, antes de serem
+        separadas em campos. Os registros de abertura e de encerramento do
+        arquivo são sempre lidos, de modo que a leitura só é considerada
+        completa se o registro 9999 for encontrado.
+
+        Com registros (por exemplo, {'C100', 'C170', 'C190'}), também são lidas
+        apenas as linhas desses registros. Com blocos e registros, são lidas as
+        linhas de ambos. O predicado recebe os campos de cada linha, ainda não
+        convertidos (valores[1] é o REG), e descarta as linhas em que ele for
+        falso antes da criação do Registro.
+
+        Com campos (um conjunto de nomes de campos ou um dicionário REG ->
+        nomes dos campos), apenas esses campos são separados e guardados em
+        cada registro; os demais ficam vazios (ver ProjecaoDeCampos).
+
+        Com internar=True, os valores dos campos que mais se repetem (ver
+        INTERNAR) são guardados uma única vez e compartilhados pelos registros;
+        internar também pode ser uma sequência de tipos de campo e/ou nomes de
+        campos (ver InternacaoDeValores). Com compacto=True, nenhum campo fica
+        guardado como str e internar não tem efeito.
+
+        O número de linhas descartadas fica em self.contexto.linhas_descartadas.
+        """
+        self.contexto = ContextoDeLeitura(filename)
+        filtro = self._filtro(blocos, registros)
+        for registro, bloco_id, papel in self._ler(filename, codificacao, rapido, compacto,
+                                                   processos, self.contexto, filtro, predicado,
+                                                   self._projecao(campos),
+                                                   self._internacao(internar)):
+            self._posicionar_registro(registro, bloco_id, papel)
         if not self.leitura_completa:
             raise RuntimeError(u"\nOcorreu uma falha ao ler o arquivo: '%s'.\n" % filename)
         elif verbose:
             print(u"O arquivo SPED '%s' foi lido com sucesso.\n" % filename)
 
+    def iter_registros(self, filename, codificacao=None, rapido=False, compacto=False,
+                       blocos=None, registros=None, predicado=None, contexto=None,
+                       campos=None, internar=None):
+        """
+        Gera os registros do arquivo SPED um a um, lendo uma linha por vez.
+        O arquivo nunca é carregado inteiro na memória.
+        A leitura termina no registro de encerramento do arquivo (9999).
+
+        Com rapido=True o arquivo é lido em bytes por sped.tokenizador: cada
+        linha é separada uma única vez e os campos só são decodificados quando
+        acessados. Com compacto=True, cada registro guarda apenas a linha em
+        bytes e as posições dos campos (sped.tokenizador.ValoresCompactos).
+
+        Cada chamada numera as linhas com o seu próprio ContextoDeLeitura, que
+        pode ser fornecido em contexto para consultar, por exemplo, o número de
+        linhas descartadas. Os parâmetros blocos, registros, predicado, campos
+        e internar têm o mesmo efeito que em readfile.
+        """
+        for registro, _, _ in self._ler(filename, codificacao, rapido, compacto,
+                                        contexto=contexto, filtro=self._filtro(blocos, registros),
+                                        predicado=predicado, projecao=self._projecao(campos),
+                                        internacao=self._internacao(internar)):
+            yield registro
+
+    def iter_registros_indexados(self, indice, reg_id=None, bloco_id=None,
+                                 numeros_das_linhas=None, codificacao=None, compacto=False):
+        """
+        Gera os registros selecionados com um sped.indice.IndiceDeArquivo,
+        lendo do disco somente as linhas correspondentes: pelos números das
+        linhas, pelo código do registro (reg_id) ou pelo bloco (bloco_id).
+        O numero_da_linha de cada registro é o da linha no arquivo.
+        """
+        if numeros_das_linhas is None:
+            if reg_id is not None:
+                numeros_das_linhas = indice.numeros_das_linhas(reg_id)
+            elif bloco_id is not None:
+                numeros_das_linhas = indice.numeros_das_linhas_do_bloco(bloco_id)
+            else:
+                numeros_das_linhas = range(1, len(indice) + 1)
+        if codificacao == 'auto':
+            codificacao = detectar_codificacao(indice.filename)
+        despacho = self._tabela_de_despacho()
+        for numero, reg_id, valores in indice.campos(numeros_das_linhas,
+                                                     codificacao or 'utf-8', compacto):
+            try:
+                registro_class = despacho[reg_id][0]
+            except KeyError:
+                raise RuntimeError(u"Arquivo inválido para EFD - PIS/COFINS. Registro: %s" % reg_id)
+            yield registro_class.de_valores(valores, numero)
+
+    def ler_colunas(self, filename, codificacao=None, formato='lista', blocos=None,
+                    registros=None, predicado=None, contexto=None, cache=None):
+        """
+        Lê o arquivo SPED no modo colunar: nenhum Registro é criado; os valores
+        de cada linha são acumulados nas colunas do seu registro (uma coluna por
+        Campo), ainda como texto. Retorna um sped.colunar.ColunasDoArquivo
+        (REG -> ColunasDoRegistro), cujas colunas são listas, arrays do NumPy
+        (formato='numpy') ou do Arrow (formato='arrow') e que fornece um
+        pandas.DataFrame por registro.
+
+        Os parâmetros blocos, registros, predicado e contexto têm o mesmo
+        efeito que em iter_registros.
+
+        Com cache (um sped.cache.CacheDeLeitura), o resultado é guardado em
+        disco e, enquanto o conteúdo do arquivo não mudar, reaproveitado sem
+        que o arquivo seja lido (o contexto não é então atualizado). O cache
+        não é usado com predicado, que não pode fazer parte da chave.
+        """
+        if cache is not None and predicado is None:
+            parametros = ('ler_colunas', self.__class__.__module__, self.__class__.__name__,
+                          codificacao, formato, sorted(blocos or ()), sorted(registros or ()))
+            return cache.obter_ou_calcular(
+                filename, lambda: self.ler_colunas(filename, codificacao, formato, blocos,
+                                                   registros, contexto=contexto),
+                *parametros)
+        colunas = ColunasDoArquivo(formato)
+        leitura_completa = False
+        for registro_class, valores, numero, _, papel in self._ler_campos(
+                filename, codificacao, False, False, contexto=contexto,
+                filtro=self._filtro(blocos, registros), predicado=predicado):
+            colunas.adicionar(registro_class, valores[1], valores, numero)
+            leitura_completa = papel == ENCERRAMENTO_DO_ARQUIVO
+        if not leitura_completa:
+            raise RuntimeError(u"\nOcorreu uma falha ao ler o arquivo: '%s'.\n" % filename)
+        return colunas
+
+    def _ler(self, filename, codificacao, rapido, compacto, processos=None, contexto=None,
+             filtro=None, predicado=None, projecao=None, internacao=None):
+        for registro_class, valores, numero, bloco_id, papel in self._ler_campos(
+                filename, codificacao, rapido, compacto, processos, contexto, filtro, predicado,
+                projecao, internacao):
+            yield registro_class.de_valores(valores, numero), bloco_id, papel
+
+    def _ler_campos(self, filename, codificacao, rapido, compacto, processos=None, contexto=None,
+                    filtro=None, predicado=None, projecao=None, internacao=None):
+        if codificacao is None: # 'utf-8', 'latin-1', ...
+            codificacao = 'utf-8'
+        elif codificacao == 'auto':
+            codificacao = detectar_codificacao(filename)
+        if contexto is None:
+            contexto = ContextoDeLeitura(filename)
+        # Um arquivo compactado só pode ser lido do início ao fim: a divisão
+        # em intervalos para a leitura em paralelo não é possível.
+        if processos is not None and processos > 1 and not compactado(filename):
+            linhas = _tokenizar_em_paralelo(self.__class__, filename, codificacao, rapido,
+                                            compacto, processos, filtro, projecao)
+        else:
+            linhas = self._tokenizar(filename, codificacao, rapido, compacto, filtro=filtro,
+                                     projecao=projecao)
+        despacho = self._tabela_de_despacho()
+        for reg_id, valores in linhas:
+            if reg_id is None:
+                # Linha descartada pelo filtro: conta apenas na numeração.
+                contexto.proxima_linha()
+                contexto.linhas_descartadas += 1
+                continue
+            try:
+                registro_class, bloco_id, papel = despacho[reg_id]
+            except KeyError:
+                raise RuntimeError(u"Arquivo inválido para EFD - PIS/COFINS. Registro: %s" % reg_id)
+            # A numeração das linhas recomeça no registro de abertura '0000'.
+            if papel == ABERTURA_DO_ARQUIVO:
+                contexto.reiniciar()
+            elif (predicado is not None and papel != ENCERRAMENTO_DO_ARQUIVO
+                  and not predicado(valores)):
+                contexto.proxima_linha()
+                contexto.linhas_descartadas += 1
+                continue
+            if internacao is not None and not compacto:
+                internacao(reg_id, valores)
+            numero = contexto.proxima_linha()
+            if papel == ENCERRAMENTO_DO_ARQUIVO:
+                # A leitura chegou ao fim: o número de linhas do arquivo fica
+                # conhecido por sped.tokenizador.contar_linhas.
+                registrar_numero_de_linhas(filename, numero)
+            yield registro_class, valores, numero, bloco_id, papel
+            # Não ler as informações após o registro de encerramento '9999'.
+            if papel == ENCERRAMENTO_DO_ARQUIVO:
+                return
+
+    def _tokenizar(self, filename, codificacao, rapido, compacto, intervalo=None, filtro=None,
+                   projecao=None):
+        if intervalo is None and not (rapido or compacto):
+            with abrir_texto(filename, codificacao) as spedfile:
+                for line in spedfile:
+                    if filtro is not None and not filtro(line):
+                        yield None, None
+                        continue
+                    yield self._separar_valores(line, projecao)
+            return
+        with abrir_binario(filename) as spedfile:
+            limite = None
+            if intervalo is not None:
+                inicio, fim = intervalo
+                spedfile.seek(inicio)
+                limite = fim - inicio
+            if rapido or compacto:
+                yield from tokenizar(spedfile, codificacao, compacto=compacto, limite=limite,
+                                     filtro=filtro, projecao=projecao)
+                return
+            for line in ler_linhas(spedfile, limite=limite):
+                if filtro is not None and not filtro(line):
+                    yield None, None
+                    continue
+                yield self._separar_valores(line.decode(codificacao, 'ignore'), projecao)
+
+    def _separar_valores(self, line, projecao=None):
+        if projecao is not None:
+            separados = projecao.separar(line)
+            if separados is not None:
+                return separados
+        line = self._normalizar_linha(line)
+        valores = [valor.strip() for valor in line.split('|')]
+        return valores[1], valores
+
+    @staticmethod
+    def _normalizar_linha(line):
+        # A simple way to remove multiple spaces in a string
+        line = re.sub(r'\s{2,}', ' ', line.strip())
+        # Em algumas EFDs foram encontrados registros digitados incorretamente em minúsculo.
+        # Por exemplo, o registro 'c491' deve ser corrigido para 'C491'.
+        return line[:6].upper() + line[6:] # line = '|c491|...' --> '|C491|...'
+
+    def _filtro(self, blocos=None, registros=None):
+        if blocos is None and registros is None:
+            return None
+        essenciais = (self.registro_abertura.__name__[len('Registro'):],
+                      self.registro_encerramento.__name__[len('Registro'):])
+        return FiltroDeLinhas(blocos or (), essenciais, registros or ())
+
+    def _projecao(self, campos=None):
+        if campos is None:
+            return None
+        return ProjecaoDeCampos(campos, self._tabela_de_despacho())
+
+    def _internacao(self, internar=None):
+        if not internar:
+            return None
+        if internar is True:
+            internar = INTERNAR
+        return InternacaoDeValores(self._tabela_de_despacho(), internar)
+
+    def _tabela_de_despacho(self):
+        """
+        Tabela construída uma única vez por subclasse de ArquivoDigital que
+        associa o código do registro (REG) a (classe, bloco, papel no arquivo).
+        """
+        cls = self.__class__
+        despacho = cls.__dict__.get('_despacho')
+        if despacho is not None:
+            return despacho
+
+        despacho = {}
+        for nome, registro_class in vars(cls.registros).items():
+            if (not nome.startswith('Registro') or not isinstance(registro_class, type)
+                    or not issubclass(registro_class, Registro)):
+                continue
+            reg_id = nome[len('Registro'):]
+            if not reg_id:
+                continue
+            bloco_id = reg_id[0]
+            bloco = self._blocos.get(bloco_id)
+            if registro_class == cls.registro_abertura:
+                papel = ABERTURA_DO_ARQUIVO
+            elif registro_class == cls.registro_encerramento:
+                papel = ENCERRAMENTO_DO_ARQUIVO
+            elif bloco is not None and registro_class == bloco.registro_abertura.__class__:
+                papel = ABERTURA_DO_BLOCO
+            elif bloco is not None and registro_class == bloco.registro_encerramento.__class__:
+                papel = ENCERRAMENTO_DO_BLOCO
+            else:
+                papel = REGISTRO
+            despacho[reg_id] = (registro_class, bloco_id, papel)
+
+        cls._despacho = despacho
+        return despacho
+
     def read_registro(self, line):
         reg_id = line.split('|')[1]
-        
         try:
-            # https://stackoverflow.com/questions/25577578/access-class-variable-from-instance
-            # Devo substituir 'self.__class__.registros' por 'type(self).registros' ?
-            registro_class = getattr(self.__class__.registros, 'Registro' + reg_id)
-        except AttributeError:
+            registro_class, bloco_id, papel = self._tabela_de_despacho()[reg_id]
+        except KeyError:
             raise RuntimeError(u"Arquivo inválido para EFD - PIS/COFINS. Registro: %s" % reg_id)
+        if papel == ABERTURA_DO_ARQUIVO:
+            self.contexto.reiniciar()
+        self._posicionar_registro(registro_class(line, self.contexto.proxima_linha()),
+                                  bloco_id, papel)
 
-        registro = registro_class(line)
-        bloco_id = reg_id[0]
+    def _posicionar_registro(self, registro, bloco_id, papel):
         bloco = self._blocos[bloco_id]
 
-        if registro.__class__ == self.__class__.registro_abertura:
+        if papel == ABERTURA_DO_ARQUIVO:
 			# Atualizar o registro de abertura 0000 do SPED
             self._registro_abertura = registro
-        elif registro.__class__ == self.__class__.registro_encerramento:
+        elif papel == ENCERRAMENTO_DO_ARQUIVO:
 			# Atualizar o registro de encerramento 9999 do SPED
             self._registro_encerramento = registro
             self.leitura_completa = True
-        elif registro.__class__ == bloco.registro_abertura.__class__:
+        elif papel == ABERTURA_DO_BLOCO:
 			# Atualizar os registros de abertura dos blocos: 0001, A001, C001, ...
-            bloco.registro_abertura = registro           
-        elif registro.__class__ == bloco.registro_encerramento.__class__:
+            bloco.registro_abertura = registro
+        elif papel == ENCERRAMENTO_DO_BLOCO:
 			# Atualizar os registros de encerramento dos blocos: 0990, A990, C990, ...
             bloco.registro_encerramento = registro
         else:
@@ -72,11 +573,9 @@ class ArquivoDigital(object):
     def write_to(self, buff):
         buff.write(self._registro_abertura.as_line() + u'\r\n')
         reg_count = 2
-        for key in self._blocos.keys():
-            bloco = self._blocos[key]
-            reg_count += len(bloco.registros)
-            for registro in bloco.registros:
-                buff.write(registro.as_line() + u'\r\n')
+        for bloco in self._blocos.values():
+            reg_count += len(bloco)
+            buff.writelines(registro.as_line() + u'\r\n' for registro in bloco.iter_registros())
 
         self._registro_encerramento[2] = reg_count
 
@@ -86,3 +585,80 @@ class ArquivoDigital(object):
         buff = StringIO()
         self.write_to(buff)
         return buff.getvalue()
+
+
+# Tamanho aproximado (em bytes) de cada intervalo da leitura em paralelo: o
+# resultado de um intervalo (os campos de todas as suas linhas) é transferido
+# de uma só vez ao processo principal.
+TAMANHO_DO_INTERVALO = 4 * 2 ** 20
+
+# Intervalos em andamento ou com resultado ainda não consumido, por processo.
+INTERVALOS_POR_PROCESSO = 2
+
+
+def _dividir_em_intervalos(filename, partes):
+    """
+    Divide o arquivo em até 'partes' intervalos de bytes (inicio, fim),
+    cada um terminando logo após uma quebra de linha.
+    """
+    tamanho = os.path.getsize(filename)
+    limites = [0]
+    with open(filename, 'rb') as spedfile:
+        for parte in range(1, partes):
+            posicao = tamanho * parte // partes
+            if posicao <= limites[-1]:
+                continue
+            spedfile.seek(posicao)
+            spedfile.readline() # avançar até o final da linha corrente
+            posicao = spedfile.tell()
+            if posicao >= tamanho:
+                break
+            limites.append(posicao)
+    limites.append(tamanho)
+    return list(zip(limites[:-1], limites[1:]))
+
+
+def _tokenizar_em_paralelo(arquivo_class, filename, codificacao, rapido, compacto, processos,
+                           filtro=None, projecao=None):
+    """
+    Gera (reg_id, valores) na ordem do arquivo. O arquivo é dividido em
+    intervalos de cerca de TAMANHO_DO_INTERVALO bytes (ao menos um por
+    processo) e no máximo INTERVALOS_POR_PROCESSO * processos deles são
+    submetidos ao Pool por vez: um novo intervalo só é submetido quando o
+    resultado mais antigo é consumido, de modo que a memória do processo
+    principal não depende do tamanho do arquivo.
+    """
+    partes = max(processos, -(-os.path.getsize(filename) // TAMANHO_DO_INTERVALO))
+    tarefas = [(arquivo_class, filename, intervalo, codificacao, rapido, compacto, filtro,
+                projecao)
+               for intervalo in _dividir_em_intervalos(filename, partes)]
+    # Importado somente aqui: a leitura em um único processo não carrega multiprocessing.
+    from multiprocessing import Pool
+    with Pool(processes=processos) as pool:
+        pendentes = deque()
+        for tarefa in tarefas:
+            if len(pendentes) >= INTERVALOS_POR_PROCESSO * processos:
+                yield from pendentes.popleft().get()
+            pendentes.append(pool.apply_async(_tokenizar_intervalo, (tarefa,)))
+        while pendentes:
+            yield from pendentes.popleft().get()
+
+
+def _tokenizar_intervalo(tarefa):
+    """
+    Executado em cada processo de _tokenizar_em_paralelo: separa em campos as
+    linhas de um intervalo do arquivo. Apenas os campos são devolvidos, pois
+    são transferidos entre processos muito mais rapidamente que os registros
+    já montados.
+    """
+    arquivo_class, filename, intervalo, codificacao, rapido, compacto, filtro, projecao = tarefa
+    encerramento = arquivo_class.registro_encerramento.__name__[len('Registro'):]
+    linhas = []
+    for reg_id, valores in arquivo_class()._tokenizar(filename, codificacao, rapido, compacto,
+                                                      intervalo, filtro, projecao):
+        linhas.append((reg_id, valores))
+        if reg_id == encerramento:
+            # A assinatura digital que pode seguir o registro 9999 não é
+            # separada em campos, como na leitura sequencial.
+            break
+    return linhas
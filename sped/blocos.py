@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
 
+from itertools import zip_longest
+
 from .registros import Registro
 
 class Bloco(object):
@@ -27,6 +29,55 @@ class Bloco(object):
     def registros(self):
         return [self.abertura] + self._registros + [self.encerramento]
 
+    def __len__(self):
+        # Quantidade de registros, inclusive os de abertura e de encerramento.
+        return len(self._registros) + 2
+
+    def iter_registros(self):
+        """Como registros, mas sem montar uma nova lista."""
+        yield self.abertura
+        yield from self._registros
+        yield self.encerramento
+
     def add(self, registro):
         # Não adiciona o registro de abertura e fechamento
         self._registros.append(registro)
+
+    def extend_rows(self, registro_class, rows):
+        """
+        Inclui um registro de registro_class para cada linha de rows: uma
+        sequência com os valores Python dos campos após o REG, na ordem de
+        registro_class.campos (valores ausentes no fim da linha ficam vazios).
+
+        Os valores são validados e convertidos coluna a coluna, por
+        Campo.codificar_coluna, e não campo a campo como em set. Retorna a
+        quantidade de registros incluídos.
+
+        >>> from datetime import date
+        >>> from sped.campos import CampoData, CampoFixo, CampoNumerico
+        >>> class RegistroC100(Registro):
+        ...     campos = [CampoFixo(1, 'REG', 'C100'), CampoData(2, 'DT_DOC'),
+        ...               CampoNumerico(3, 'VL_DOC', precisao=2), CampoNumerico(4, 'VL_PIS', precisao=2)]
+        >>> bloco = Bloco('C')
+        >>> bloco.extend_rows(RegistroC100, [(date(2019, 1, 31), 1500.5, 9.75), (None, 20)])
+        2
+        >>> [registro.as_line() for registro in bloco._registros]
+        ['|C100|31012019|1500,50|9,75|', '|C100||20||']
+        """
+        linhas = [tuple(row) for row in rows]
+        if not linhas:
+            return 0
+        campos = [campo for campo in registro_class.campos if campo.indice > 1]
+        colunas = list(zip_longest(*linhas, fillvalue=''))
+        if len(colunas) > len(campos):
+            raise RuntimeError(u"Linha com %s valores para os %s campos do %s após o REG."
+                               % (len(colunas), len(campos), registro_class.__name__))
+        # Colunas ausentes em todas as linhas também são verificadas (campos obrigatórios).
+        colunas += [[''] * len(linhas)] * (len(campos) - len(colunas))
+        textos = [campo.codificar_coluna(coluna, registro_class)
+                  for campo, coluna in zip(campos, colunas)]
+        reg_id = registro_class().valores[1]
+        de_valores = registro_class.de_valores
+        self._registros.extend(de_valores(['', reg_id, *valores, ''])
+                               for valores in zip(*textos))
+        return len(linhas)
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+
+"""
+Cache em disco dos resultados da leitura de arquivos SPED.
+
+Cada resultado é guardado (pickle) sob uma chave formada pelo hash do
+conteúdo do arquivo SPED, pela versão da biblioteca e pelos parâmetros da
+leitura. Assim, uma nova execução sobre arquivos não alterados reaproveita o
+resultado sem ler os arquivos de novo. Arquivos renomeados ou copiados para
+outra pasta continuam sendo encontrados, pois a chave depende apenas do
+conteúdo.
+
+O tamanho total do cache é limitado: quando o limite é ultrapassado, os
+resultados usados há mais tempo são removidos (LRU, pela data de
+modificação, que é atualizada a cada uso).
+
+O diretório do cache é, nesta ordem, o informado, o da variável de ambiente
+SPED_CACHE ou '$XDG_CACHE_HOME/python-sped' ('~/.cache/python-sped').
+
+>>> import os, tempfile
+>>> pasta = tempfile.mkdtemp()
+>>> cache = CacheDeLeitura(os.path.join(pasta, 'cache'), tamanho_maximo=2 ** 20)
+>>> with open(os.path.join(pasta, 'sped.txt'), 'wb') as f:
+...     _ = f.write(b'|0000|a|\\r\\n|9999|2|\\r\\n')
+>>> chave = cache.chave(f.name, 'colunas', 'lista')
+>>> cache.obter(chave) is None
+True
+>>> cache.guardar(chave, {'0000': [['', '0000', 'a', '']]})
+>>> cache.obter(chave)
+{'0000': [['', '0000', 'a', '']]}
+>>> cache.obter_ou_calcular(f.name, lambda: 1 / 0, 'colunas', 'lista')
+{'0000': [['', '0000', 'a', '']]}
+>>> cache.chave(f.name, 'colunas', 'numpy') == chave
+False
+>>> cache.limpar()
+>>> len(cache), cache.tamanho()
+(0, 0)
+>>> os.remove(f.name); os.rmdir(cache.diretorio); os.rmdir(pasta)
+"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+
+from .compressao import abrir_binario
+from .compressao import assinatura as assinatura_do_arquivo
+
+# Versão do formato do cache: alterada quando o conteúdo guardado mudar.
+FORMATO = 1
+
+EXTENSAO = '.pickle'
+
+# Tamanho máximo padrão (em bytes) de todos os resultados guardados.
+TAMANHO_MAXIMO = 2 * 2 ** 30
+
+# Quantidade de bytes lidos do arquivo SPED a cada atualização do hash.
+_TAMANHO_DO_BLOCO = 2 ** 20
+
+# Hash do conteúdo de cada arquivo, por (tamanho, data de modificação).
+_hashes = {}
+
+
+def hash_do_conteudo(filename):
+    """
+    Hash (BLAKE2b, 128 bits) do conteúdo de filename. É calculado uma única
+    vez por processo enquanto o arquivo não for alterado.
+    """
+    caminho, assinatura = assinatura_do_arquivo(filename)
+    guardado = _hashes.get(caminho)
+    if guardado is not None and guardado[0] == assinatura:
+        return guardado[1]
+    resumo = hashlib.blake2b(digest_size=16)
+    with abrir_binario(filename) as arquivo:
+        for bloco in iter(lambda: arquivo.read(_TAMANHO_DO_BLOCO), b''):
+            resumo.update(bloco)
+    _hashes[caminho] = (assinatura, resumo.hexdigest())
+    return resumo.hexdigest()
+
+
+def diretorio_padrao():
+    diretorio = os.environ.get('SPED_CACHE')
+    if diretorio:
+        return diretorio
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'python-sped')
+
+
+class CacheDeLeitura(object):
+    """
+    Resultados guardados em diretorio, um arquivo por chave. Vários processos
+    podem usar o mesmo diretório: cada resultado é gravado em um arquivo
+    temporário e renomeado ao final.
+    """
+
+    def __init__(self, diretorio=None, tamanho_maximo=TAMANHO_MAXIMO):
+        self.diretorio = diretorio or diretorio_padrao()
+        self.tamanho_maximo = tamanho_maximo
+
+    def __repr__(self):
+        return '<%s.%s(%s)>' % (self.__class__.__module__, self.__class__.__name__, self.diretorio)
+
+    def __len__(self):
+        return len(self._entradas())
+
+    def chave(self, filename, *parametros):
+        """
+        Chave do resultado da leitura de filename com os parametros
+        informados (que devem ter uma representação estável por repr()).
+        """
+        from . import __version__
+        resumo = hashlib.blake2b(digest_size=16)
+        resumo.update(repr((FORMATO, __version__, hash_do_conteudo(filename),
+                            parametros)).encode('utf-8'))
+        return resumo.hexdigest()
+
+    def obter(self, chave, padrao=None):
+        caminho = self._caminho(chave)
+        try:
+            with open(caminho, 'rb') as arquivo:
+                valor = pickle.load(arquivo)
+        except FileNotFoundError:
+            return padrao
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError):
+            # Resultado corrompido ou de uma versão incompatível do código.
+            self._remover(caminho)
+            return padrao
+        try:
+            os.utime(caminho) # marcar o uso, para a remoção LRU
+        except OSError:
+            pass
+        return valor
+
+    def guardar(self, chave, valor):
+        os.makedirs(self.diretorio, exist_ok=True)
+        descritor, temporario = tempfile.mkstemp(dir=self.diretorio, suffix='.tmp')
+        try:
+            with os.fdopen(descritor, 'wb') as arquivo:
+                pickle.dump(valor, arquivo, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporario, self._caminho(chave))
+        except BaseException:
+            self._remover(temporario)
+            raise
+        self.reduzir()
+
+    def obter_ou_calcular(self, filename, calcular, *parametros):
+        """
+        Resultado guardado para (filename, parametros) ou, se não houver,
+        o resultado de calcular(), que é então guardado.
+        """
+        chave = self.chave(filename, *parametros)
+        ausente = object()
+        valor = self.obter(chave, ausente)
+        if valor is ausente:
+            valor = calcular()
+            self.guardar(chave, valor)
+        return valor
+
+    def tamanho(self):
+        """Tamanho total (em bytes) dos resultados guardados."""
+        return sum(tamanho for _, tamanho, _ in self._entradas())
+
+    def reduzir(self, tamanho_maximo=None):
+        """Remove os resultados usados há mais tempo até que o limite seja respeitado."""
+        if tamanho_maximo is None:
+            tamanho_maximo = self.tamanho_maximo
+        entradas = sorted(self._entradas(), key=lambda entrada: entrada[2])
+        total = sum(tamanho for _, tamanho, _ in entradas)
+        for caminho, tamanho, _ in entradas:
+            if total <= tamanho_maximo:
+                break
+            self._remover(caminho)
+            total -= tamanho
+
+    def limpar(self):
+        self.reduzir(0)
+
+    def _caminho(self, chave):
+        return os.path.join(self.diretorio, chave + EXTENSAO)
+
+    def _entradas(self):
+        """Lista de (caminho, tamanho, último uso) dos resultados guardados."""
+        entradas = []
+        try:
+            nomes = os.listdir(self.diretorio)
+        except FileNotFoundError:
+            return entradas
+        for nome in nomes:
+            if not nome.endswith(EXTENSAO):
+                continue
+            caminho = os.path.join(self.diretorio, nome)
+            try:
+                estado = os.stat(caminho)
+            except FileNotFoundError: # removido por outro processo
+                continue
+            entradas.append((caminho, estado.st_size, estado.st_mtime_ns))
+        return entradas
+
+    @staticmethod
+    def _remover(caminho):
+        try:
+            os.remove(caminho)
+        except FileNotFoundError:
+            pass
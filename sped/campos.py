@@ -5,10 +5,18 @@ import re
 from datetime import date
 from datetime import datetime
 from decimal import Decimal
+from functools import lru_cache
 
 from .erros import CampoFixoError
 from .erros import CampoObrigatorioError
 from .erros import FormatoInvalidoError
+from . import validadores
+
+# Caracteres que não são dígitos, removidos de CNPJ, CPF e chaves.
+_NAO_DIGITOS = re.compile(r'\D')
+
+# Data ddmmaaaa somente com dígitos ASCII.
+_DDMMAAAA = re.compile(r'[0-9]{8}\Z')
 
 
 class Campo(object):
@@ -25,6 +33,8 @@ class Campo(object):
     >>> campo.obrigatorio
     True
     """
+    __slots__ = ('_indice', '_nome', '_obrigatorio')
+
     def __init__(self, indice, nome, obrigatorio=False):
         self._indice = indice
         self._nome = nome
@@ -66,6 +76,44 @@ class Campo(object):
     def validar(valor):
         return True
 
+    def codificar_coluna(self, valores, registro_class=None):
+        """
+        Converte uma coluna de valores em texto do SPED, com as mesmas
+        verificações de set, feitas uma única vez por valor distinto
+        (ver Bloco.extend_rows). registro_class identifica o registro nas
+        mensagens de erro.
+
+        >>> Campo(2, 'COD_ITEM', obrigatorio=True).codificar_coluna(['A1', 'B2', 'A1'])
+        ['A1', 'B2', 'A1']
+        >>> Campo(2, 'COD_ITEM', obrigatorio=True).codificar_coluna(['A1', None]) # doctest: +IGNORE_EXCEPTION_DETAIL
+        Traceback (most recent call last):
+         ...
+        CampoObrigatorioError: NoneType -> COD_ITEM
+        """
+        textos = ['' if valor is None else valor for valor in valores]
+        try:
+            distintos = set(textos)
+        except TypeError: # valores que não são texto (listas, dicionários, ...)
+            raise FormatoInvalidoError(_registro_do_erro(registro_class), self.nome)
+        if self._obrigatorio and '' in distintos:
+            raise CampoObrigatorioError(_registro_do_erro(registro_class), self.nome)
+        distintos.discard('')
+        if any(not isinstance(valor, str) for valor in distintos):
+            raise FormatoInvalidoError(_registro_do_erro(registro_class), self.nome)
+        if self.__class__.validar is not Campo.validar:
+            distintos = list(distintos)
+            validar_lote = getattr(self, 'validar_lote', None)
+            validos = (validar_lote(distintos) if validar_lote is not None
+                       else [self.validar(valor) for valor in distintos])
+            if not all(validos):
+                raise FormatoInvalidoError(_registro_do_erro(registro_class), self.nome)
+        return textos
+
+
+def _registro_do_erro(registro_class):
+    # Os erros de campo (sped.erros.CampoError) identificam o registro por uma instância.
+    return registro_class() if registro_class is not None else None
+
 
 class CampoFixo(Campo):
     """
@@ -83,6 +131,8 @@ class CampoFixo(Campo):
     >>> campo.valor
     '0000'
     """
+    __slots__ = ('_valor',)
+
     def __init__(self, indice, nome, valor):
         super().__init__(indice, nome, True)
         self._valor = valor
@@ -98,8 +148,16 @@ class CampoFixo(Campo):
         if valor != self._valor:
             raise CampoFixoError(registro, self.nome)
 
+    def codificar_coluna(self, valores, registro_class=None):
+        valores = list(valores)
+        if any(valor != self._valor for valor in valores):
+            raise CampoFixoError(_registro_do_erro(registro_class), self.nome)
+        return valores
+
 
 class CampoAlfanumerico(Campo):
+    __slots__ = ('_tamanho',)
+
     def __init__(self, indice, nome, obrigatorio=False, tamanho=None):
         super().__init__(indice, nome, obrigatorio)
         self._tamanho = tamanho
@@ -114,8 +172,16 @@ class CampoAlfanumerico(Campo):
             valor = valor[:self._tamanho]
         super().set(registro, valor)
 
+    def codificar_coluna(self, valores, registro_class=None):
+        if self._tamanho is not None:
+            tamanho = self._tamanho
+            valores = [valor[:tamanho] if isinstance(valor, str) else valor for valor in valores]
+        return super().codificar_coluna(valores, registro_class)
+
 
 class CampoBool(Campo):
+    __slots__ = ('valorVerdadeiro', 'valorFalso')
+
     def __init__(self, indice, nome, obrigatorio=False, valorVerdadeiro='S', valorFalso='N'):
         super().__init__(indice, nome, obrigatorio)
         self.valorVerdadeiro = valorVerdadeiro
@@ -135,12 +201,54 @@ class CampoBool(Campo):
         else:
             raise FormatoInvalidoError(registro, self.nome)
 
+    def codificar_coluna(self, valores, registro_class=None):
+        verdadeiro, falso = self.valorVerdadeiro, self.valorFalso
+        textos = [verdadeiro if valor is True else falso if valor is False
+                  else '' if valor is None or valor == '' else None for valor in valores]
+        if None in textos:
+            raise FormatoInvalidoError(_registro_do_erro(registro_class), self.nome)
+        return super().codificar_coluna(textos, registro_class)
+
 
 class CampoNumerico(Campo):
+    """
+    Campo numérico com precisao casas decimais, no formato do SPED ('1234,56').
+
+    Além de get (Decimal), os valores podem ser obtidos como inteiros escalados
+    pela precisão do campo (centavos, para precisao=2), o que permite somas
+    exatas e rápidas: get_inteiro para um registro e decodificar_coluna para
+    uma coluna inteira de valores (ver ArquivoDigital.ler_colunas). Como nem
+    todos os leiautes declaram a precisão dos campos (os da EFD, por exemplo),
+    ela também pode ser informada diretamente; sem ela, somente valores sem
+    casas decimais são convertidos em inteiros.
+
+    >>> campo = CampoNumerico(2, 'VL_ITEM', precisao=2)
+    >>> campo.para_inteiro('1234,56'), campo.para_inteiro('-0,5'), campo.para_inteiro('10')
+    (123456, -50, 1000)
+    >>> campo.para_inteiro('1,005'), campo.para_inteiro('-1,005'), campo.para_inteiro('')
+    (101, -101, None)
+    >>> campo.decodificar_coluna(['1,00', '', '0,01'])
+    [100, None, 1]
+    >>> CampoNumerico(2, 'VL_BC_PIS').decodificar_coluna(['1,5', '2,25'], precisao=2)
+    [150, 225]
+    >>> CampoNumerico(2, 'NUM_ITEM').decodificar_coluna(['1', '', '12'])
+    [1, None, 12]
+    >>> CampoNumerico(2, 'VL_BC_PIS').para_inteiro('1234,56')
+    Traceback (most recent call last):
+     ...
+    RuntimeError: Campo VL_BC_PIS sem precisão declarada: informe a precisão para converter '1234,56'.
+    >>> campo.codificar_coluna([1234.5, Decimal('0.5'), 7, '1,5', None])
+    ['1234,50', '0,50', '7', '1,50', '']
+    """
+    __slots__ = ('_precisao', '_minimo', '_maximo', '_formato')
+
     def __init__(self, indice, nome, obrigatorio=False,
                  precisao=None, minimo=0, maximo=1000):
         super().__init__(indice, nome, obrigatorio)
-        self._precisao = precisao if precisao is not None else 0
+        # None quando o leiaute não declara a precisão (ver para_inteiro).
+        self._precisao = precisao
+        # Formato (como '%.2f') montado uma única vez, e não a cada valor.
+        self._formato = '%%.%sf' % (precisao or 0)
         self._minimo = minimo
         self._maximo = maximo
 
@@ -162,21 +270,157 @@ class CampoNumerico(Campo):
             return None
         return Decimal(valor.replace(',', '.'))
 
+    def get_inteiro(self, registro, precisao=None):
+        return self.para_inteiro(super().get(registro), precisao)
+
+    def para_inteiro(self, valor, precisao=None):
+        """
+        Converte o texto do SPED em um inteiro escalado por 10 ** precisao
+        (por padrão, a precisão do campo). Casas decimais além da precisão são
+        arredondadas (metade para longe do zero). Sem precisão informada nem
+        declarada, um valor com casas decimais resulta em RuntimeError, e não
+        em um inteiro arredondado.
+        """
+        if not valor:
+            return None
+        if precisao is None:
+            precisao = self._precisao
+        inteiro, _, fracao = valor.partition(',')
+        if precisao is None:
+            if fracao:
+                raise RuntimeError(u"Campo %s sem precisão declarada: informe a precisão "
+                                   u"para converter '%s'." % (self.nome, valor))
+            return int(inteiro)
+        excesso = len(fracao) - precisao
+        if excesso == 0:
+            return int(inteiro + fracao)
+        if excesso < 0:
+            return int(inteiro + fracao + '0' * -excesso)
+        quociente, resto = divmod(abs(int(inteiro + fracao)), 10 ** excesso)
+        if 2 * resto >= 10 ** excesso:
+            quociente += 1
+        return -quociente if inteiro.startswith('-') else quociente
+
+    def decodificar_coluna(self, valores, formato='lista', vazio=None, precisao=None):
+        """
+        Converte uma coluna de valores em texto em inteiros escalados.
+
+        Com formato='numpy' retorna um array int64, em que os valores vazios
+        são substituídos por vazio (0, se vazio for None); com formato='arrow',
+        um array int64 do Arrow, com os valores vazios como nulos (ou vazio).
+        """
+        if hasattr(valores, 'to_pylist'): # pyarrow.Array
+            valores = valores.to_pylist()
+        if precisao is None:
+            precisao = self._precisao
+        para_inteiro = self.para_inteiro
+        if precisao is None:
+            # Somente valores sem casas decimais (ver para_inteiro).
+            inteiros = [para_inteiro(valor) for valor in valores]
+        else:
+            # Caso mais comum: exatamente precisao casas decimais ('1234,56'),
+            # convertido com uma única chamada a int().
+            virgula = -precisao - 1
+            inteiros = [int(valor.replace(',', ''))
+                        if precisao and len(valor) > precisao and valor[virgula] == ','
+                        else para_inteiro(valor, precisao)
+                        for valor in valores]
+        if vazio is not None or formato == 'numpy':
+            vazio = vazio or 0
+            inteiros = [vazio if inteiro is None else inteiro for inteiro in inteiros]
+        if formato == 'numpy':
+            import numpy as np
+            return np.array(inteiros, dtype=np.int64)
+        if formato == 'arrow':
+            import pyarrow as pa
+            return pa.array(inteiros, type=pa.int64())
+        return inteiros
+
     def set(self, registro, valor):
+        texto = self._texto(valor)
+        if texto is None:
+            raise FormatoInvalidoError(registro, self.nome)
+        super().set(registro, texto)
+
+    def _texto(self, valor):
+        # Texto do SPED para valor, ou None se o valor não for numérico.
         if isinstance(valor, str):
             valor = Decimal(valor.replace(',', '.'))
 
         if isinstance(valor, Decimal) or isinstance(valor, float):
-            super().set(registro, (('%.' + str(self._precisao) + 'f') % valor).replace('.', ','))
+            return (self._formato % valor).replace('.', ',')
         elif isinstance(valor, int):
-            super().set(registro, str(valor))
+            return str(valor)
         elif not valor:
-            super().set(registro, '0')
-        else:
-            raise FormatoInvalidoError(registro, self.nome)
+            return '0'
+        return None
+
+    def codificar_coluna(self, valores, registro_class=None):
+        """
+        Como set, mas para uma coluna inteira. Diferentemente de set, None
+        e '' resultam em um campo vazio (campo não informado), e não em '0'.
+        """
+        formato = self._formato
+        texto = self._texto
+        # Casos mais comuns (float e int) convertidos sem chamadas de método.
+        textos = [(formato % valor).replace('.', ',') if valor.__class__ is float
+                  else str(valor) if valor.__class__ is int
+                  else '' if valor is None or valor == '' else texto(valor) for valor in valores]
+        if None in textos:
+            raise FormatoInvalidoError(_registro_do_erro(registro_class), self.nome)
+        if self._obrigatorio and '' in textos:
+            raise CampoObrigatorioError(_registro_do_erro(registro_class), self.nome)
+        return textos
+
+
+@lru_cache(maxsize=4096)
+def _decodificar_data(valor):
+    # Um arquivo tem poucas centenas de datas distintas, repetidas em milhares de linhas.
+    if _DDMMAAAA.match(valor):
+        return date(int(valor[4:]), int(valor[2:4]), int(valor[:2]))
+    return datetime.strptime(valor, '%d%m%Y').date()
+
+
+@lru_cache(maxsize=4096)
+def _dias_desde_1970(valor):
+    # Representação interna de numpy.datetime64[D].
+    return _decodificar_data(valor).toordinal() - 719163 # date(1970, 1, 1).toordinal()
+
+
+@lru_cache(maxsize=4096)
+def _codificar_data(data):
+    return '%02d%02d%04d' % (data.day, data.month, data.year)
+
+
+@lru_cache(maxsize=4096)
+def _formatar_data(valor):
+    data = _decodificar_data(valor)
+    return '%02d/%02d/%04d' % (data.day, data.month, data.year)
 
 
 class CampoData(Campo):
+    """
+    Campo de data no formato do SPED: ddmmaaaa.
+
+    As datas são decodificadas sem strptime e memorizadas, pois se repetem
+    muito em um mesmo arquivo. decodificar_coluna converte uma coluna inteira
+    (ver ArquivoDigital.ler_colunas), inclusive para numpy.datetime64.
+
+    >>> CampoData.decodificar('31012019'), CampoData.decodificar('')
+    (datetime.date(2019, 1, 31), None)
+    >>> CampoData.formatar('01022019')
+    '01/02/2019'
+    >>> CampoData.decodificar('31022019') # doctest: +IGNORE_EXCEPTION_DETAIL
+    Traceback (most recent call last):
+     ...
+    ValueError: day is out of range for month
+    >>> CampoData(2, 'DT_DOC').decodificar_coluna(['01012019', ''])
+    [datetime.date(2019, 1, 1), None]
+    >>> CampoData(2, 'DT_DOC').codificar_coluna([date(2019, 1, 31), None])
+    ['31012019', '']
+    """
+    __slots__ = ()
+
     def __init__(self, indice, nome, obrigatorio=False):
         super().__init__(indice, nome, obrigatorio)
 
@@ -184,28 +428,63 @@ class CampoData(Campo):
         valor = super().get(registro)
         if not valor:
             return None
-        return datetime.strptime(valor, '%d%m%Y').date()
+        return _decodificar_data(valor)
 
     def set(self, registro, valor):
         # https://stackoverflow.com/questions/19887353/attributeerror-str-object-has-no-attribute-strftime
-        valor = datetime.strptime(valor, '%d%m%Y')
+        if valor and isinstance(valor, str):
+            # Texto ddmmaaaa: ValueError se não for uma data válida.
+            valor = _decodificar_data(valor)
         if isinstance(valor, date):
-            super().set(registro, valor.strftime('%d%m%Y'))
+            super().set(registro, _codificar_data(valor))
         elif not valor:
             super().set(registro, None)
         else:
             raise FormatoInvalidoError(registro, self.nome)
 
+    def codificar_coluna(self, valores, registro_class=None):
+        textos = [_codificar_data(valor) if isinstance(valor, date)
+                  else '' if not valor
+                  else _codificar_data(_decodificar_data(valor)) if isinstance(valor, str)
+                  else None for valor in valores]
+        if None in textos:
+            raise FormatoInvalidoError(_registro_do_erro(registro_class), self.nome)
+        return super().codificar_coluna(textos, registro_class)
+
+    @staticmethod
+    def decodificar(valor):
+        if not valor:
+            return None
+        return _decodificar_data(valor)
+
     @staticmethod
     def formatar(data_in):
-        dt = datetime.strptime(data_in, "%d%m%Y") # ddmmaaaa
-        #data_out =  dt.isoformat('T')
-        #data_out = dt.strftime('%x %X') # excel date format
-        data_out = dt.strftime("%d/%m/%Y")
-        return data_out
+        # ddmmaaaa --> dd/mm/aaaa
+        return _formatar_data(data_in)
+
+    def decodificar_coluna(self, valores, formato='lista'):
+        """
+        Converte uma coluna de datas ddmmaaaa em datetime.date (None se vazia).
+        Com formato='numpy' retorna um array datetime64[D] (NaT se vazia) e com
+        formato='arrow', um array date32 do Arrow.
+        """
+        if hasattr(valores, 'to_pylist'): # pyarrow.Array
+            valores = valores.to_pylist()
+        if formato == 'numpy':
+            import numpy as np
+            nat = np.iinfo(np.int64).min # valor interno de NaT
+            dias = [_dias_desde_1970(valor) if valor else nat for valor in valores]
+            return np.array(dias, dtype=np.int64).view('datetime64[D]')
+        datas = [_decodificar_data(valor) if valor else None for valor in valores]
+        if formato == 'arrow':
+            import pyarrow as pa
+            return pa.array(datas, type=pa.date32())
+        return datas
 
 
 class CampoRegex(Campo):
+    __slots__ = ('_regex',)
+
     def __init__(self, indice, nome, obrigatorio=False, regex=None):
         super().__init__(indice, nome, obrigatorio)
         self._regex = re.compile('^' + regex + '$')
@@ -218,43 +497,33 @@ class CampoRegex(Campo):
         else:
             raise FormatoInvalidoError(registro, str(self))
 
+    def codificar_coluna(self, valores, registro_class=None):
+        textos = [valor if isinstance(valor, str) else '' if valor is None else str(valor)
+                  for valor in valores]
+        regex = self._regex
+        if any(valor and not regex.match(valor) for valor in set(textos)):
+            raise FormatoInvalidoError(_registro_do_erro(registro_class), self.nome)
+        return super().codificar_coluna(textos, registro_class)
+
     # def __repr__(self):
     #     return '' f'{self.__class__.__name__}({self.indice}, {self.nome}, {self._obrigatorio}, {self._regex})'
 
 
 class CampoCNPJ(Campo):
+    __slots__ = ()
+
     @staticmethod
     def validar(valor):
         # valor = '53.939.351/0001-29'
-        # remover os caracteres não dígitos (\D)
-        valor = re.sub(r'\D', '', valor)
-
-        if not re.search(r'^\d{14}$', str(valor)):
-            return False
-
-        multiplicadores = [6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]
-
-        cnpj = [int(c) for c in valor]
-
-        soma1 = sum([cnpj[i] * multiplicadores[i+1] for i in range(12)])
-        soma2 = sum([cnpj[i] * multiplicadores[i] for i in range(13)])
-        digito1 = 11 - (soma1 % 11)
-        digito2 = 11 - (soma2 % 11)
-
-        if digito1 >= 10:
-            digito1 = 0
+        return validadores.CNPJ.validar(valor)
 
-        if digito2 >= 10:
-            digito2 = 0
-
-        if cnpj[12] != digito1 or cnpj[13] != digito2:
-            return False
-
-        return True
+    @staticmethod
+    def validar_lote(valores, formato='lista'):
+        return validadores.CNPJ.validar_lote(valores, formato)
 
     @staticmethod
     def formatar(cnpj):
-        cnpj = re.sub(r'\D', '', cnpj)
+        cnpj = _NAO_DIGITOS.sub('', cnpj)
         mensagem_de_validacao = ''
         if len(cnpj) >= 1:
             if not CampoCNPJ.validar(cnpj):
@@ -265,38 +534,20 @@ class CampoCNPJ(Campo):
 
 
 class CampoCPF(Campo):
+    __slots__ = ()
+
     @staticmethod
     def validar(valor):
         # valor = '333.333.333-33'
-        # remover os caracteres não dígitos (\D)
-        valor = re.sub(r'\D', '', valor)
-
-        if not re.search(r'^\d{11}$', str(valor)):
-            return False
-
-        multiplicadores = [11, 10, 9, 8, 7, 6, 5, 4, 3, 2]
-
-        cpf = [int(c) for c in valor]
+        return validadores.CPF.validar(valor)
 
-        soma1 = sum([cpf[i] * multiplicadores[i+1] for i in range(9)])
-        soma2 = sum([cpf[i] * multiplicadores[i] for i in range(10)])
-        digito1 = 11 - (soma1 % 11)
-        digito2 = 11 - (soma2 % 11)
-
-        if digito1 >= 10:
-            digito1 = 0
-
-        if digito2 >= 10:
-            digito2 = 0
-
-        if cpf[9] != digito1 or cpf[10] != digito2:
-            return False
-
-        return True
+    @staticmethod
+    def validar_lote(valores, formato='lista'):
+        return validadores.CPF.validar_lote(valores, formato)
     
     @staticmethod
     def formatar(cpf):
-        cpf = re.sub(r'\D', '', cpf)
+        cpf = _NAO_DIGITOS.sub('', cpf)
         mensagem_de_validacao = ''
         if len(cpf) >= 1:
             if not CampoCPF.validar(cpf):
@@ -307,10 +558,12 @@ class CampoCPF(Campo):
 
 
 class CampoCPFouCNPJ(Campo):
+    __slots__ = ()
+
     @staticmethod
     def validar(valor):
         # remover os caracteres não dígitos (\D)
-        valor = re.sub(r'\D', '', valor)
+        valor = _NAO_DIGITOS.sub('', valor)
 
         if len(valor) == 14:
             return CampoCNPJ.validar(valor)
@@ -320,7 +573,7 @@ class CampoCPFouCNPJ(Campo):
 
     @staticmethod
     def formatar(digt):
-        digt = re.sub(r'\D', '', digt)
+        digt = _NAO_DIGITOS.sub('', digt)
         mensagem_de_validacao = ''
         if len(digt) >= 1:
             if len(digt) == 11 and not CampoCPF.validar(digt):
@@ -338,37 +591,20 @@ class CampoCPFouCNPJ(Campo):
 # Fonte: 'NFe Manual_de_Orientacao_Contribuinte_v_6.00.pdf', pg 144.
 # 5.4 Cálculo do Dígito Verificador da Chave de Acesso da NF-e
 class CampoChaveEletronica(Campo):
+    __slots__ = ()
+
     @staticmethod
     def validar(valor):
-        # remover os caracteres não dígitos (\D)
-        valor = re.sub(r'\D', '', valor)
+        # O CNPJ do emitente, contido na chave, também é verificado.
+        return validadores.CHAVE_ELETRONICA.validar(valor)
 
-        if not re.search(r'^\d{44}$', str(valor)):
-            return False
-
-        chave = [int(digito) for digito in valor]
-        multiplicadores = [4, 3, 2] + [9, 8, 7, 6, 5, 4, 3, 2] * 5 + [0]
-
-        soma = sum([chave[i] * multiplicadores[i] for i in range(44)])
-
-        resto_da_divisao = soma % 11
-        digito_verificador = 11 - resto_da_divisao
-
-        if digito_verificador >= 10:
-            digito_verificador = 0
-
-        if chave[-1] != digito_verificador:
-            return False
-
-        # dentro da chave eletrônica há o CNPJ do emitente
-        # que também será verificado
-        cnpj = str(valor)[6:20]
-
-        return CampoCNPJ.validar(cnpj)
+    @staticmethod
+    def validar_lote(valores, formato='lista'):
+        return validadores.CHAVE_ELETRONICA.validar_lote(valores, formato)
 
     @staticmethod
     def formatar(chave):
-        chave = re.sub(r'\D', '', chave)
+        chave = _NAO_DIGITOS.sub('', chave)
         mensagem_de_validacao = ''
         if len(chave) >= 1:
             if not CampoChaveEletronica.validar(chave):
@@ -379,6 +615,8 @@ class CampoChaveEletronica(Campo):
 
 
 class CampoNCM(Campo):
+    __slots__ = ()
+
     @staticmethod
     def formatar(ncm):
         if len(ncm) == 8:
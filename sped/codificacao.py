@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+
+"""
+Detecção da codificação (UTF-8 ou Latin-1) de arquivos SPED.
+
+Uma única amostra limitada de bytes do início do arquivo é lida e guardada,
+junto com a primeira linha, por (caminho, tamanho, data de modificação).
+Assim a busca de arquivos (sped.relatorios.find_efd_files) e a leitura
+(ArquivoDigital.readfile com codificacao='auto') usam a mesma detecção,
+sem reabrir o arquivo enquanto ele não for alterado. Arquivos compactados
+são amostrados sem descompactação em disco (ver sped.compressao).
+"""
+
+import codecs
+import re
+from collections import namedtuple
+
+from .compressao import abrir_binario
+from .compressao import assinatura as assinatura_do_arquivo
+
+# Quantidade de bytes lidos do início do arquivo para a detecção.
+TAMANHO_DA_AMOSTRA = 2 ** 16
+
+Amostra = namedtuple('Amostra', ['codificacao', 'primeira_linha'])
+
+_amostras = {}
+
+_NAO_ASCII = re.compile(rb'[\x80-\xff]')
+
+
+def amostrar(filename, tamanho_da_amostra=TAMANHO_DA_AMOSTRA):
+    """
+    Retorna a Amostra (codificacao, primeira_linha em bytes) de filename,
+    lendo o arquivo somente se ele não tiver sido amostrado antes ou se tiver
+    sido alterado desde então.
+
+    >>> import os, tempfile
+    >>> with tempfile.NamedTemporaryFile('wb', delete=False) as f:
+    ...     _ = f.write('|0000|EMPRESA SÃO JOÃO|\\r\\n|9999|2|\\r\\n'.encode('latin-1'))
+    >>> amostrar(f.name)
+    Amostra(codificacao='Latin-1', primeira_linha=b'|0000|EMPRESA S\\xc3O JO\\xc3O|\\r')
+    >>> with open(f.name, 'wb') as arquivo:
+    ...     _ = arquivo.write('|0000|EMPRESA SÃO JOÃO|\\r\\n|9999|2|\\r\\n'.encode('utf-8'))
+    >>> detectar_codificacao(f.name)
+    'UTF-8'
+    >>> os.remove(f.name)
+    """
+    caminho, assinatura = assinatura_do_arquivo(filename)
+    guardada = _amostras.get(caminho)
+    if guardada is not None and guardada[0] == assinatura:
+        return guardada[1]
+    with abrir_binario(filename) as arquivo:
+        dados = arquivo.read(tamanho_da_amostra)
+    amostra = Amostra(codificacao_da_amostra(dados), dados.split(b'\n', 1)[0])
+    _amostras[caminho] = (assinatura, amostra)
+    return amostra
+
+
+def detectar_codificacao(filename):
+    return amostrar(filename).codificacao
+
+
+def codificacao_da_amostra(dados):
+    """
+    'UTF-8' se a amostra contém caracteres não ASCII e é UTF-8 válido (um
+    caractere cortado no fim da amostra é aceito); caso contrário, 'Latin-1'.
+
+    >>> codificacao_da_amostra('ação'.encode('utf-8')[:-1])
+    'UTF-8'
+    >>> codificacao_da_amostra('ação'.encode('latin-1')), codificacao_da_amostra(b'|0000|')
+    ('Latin-1', 'Latin-1')
+    """
+    if not _NAO_ASCII.search(dados):
+        return 'Latin-1'
+    try:
+        codecs.getincrementaldecoder('utf-8')().decode(dados, final=False)
+    except UnicodeDecodeError:
+        return 'Latin-1'
+    return 'UTF-8'
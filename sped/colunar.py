@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+
+"""
+Leitura colunar de arquivos SPED (ver ArquivoDigital.ler_colunas).
+
+Em vez de um objeto Registro por linha, os valores de cada registro (REG)
+são acumulados em colunas, uma por Campo da classe do registro. As colunas
+podem ser obtidas como listas, arrays do NumPy ou do Arrow, ou reunidas em
+um pandas.DataFrame por registro. NumPy, pyarrow e pandas só são importados
+quando o formato correspondente é solicitado.
+"""
+
+from collections import OrderedDict
+from itertools import zip_longest
+
+FORMATOS = ('lista', 'numpy', 'arrow')
+
+# Quantidade de linhas acumuladas antes de serem transpostas para as colunas.
+TAMANHO_DO_LOTE = 4096
+
+
+class ColunasDoRegistro(object):
+    """
+    Colunas com os valores (ainda como texto) das linhas de um registro.
+
+    >>> from sped.registros import Registro
+    >>> from sped.campos import CampoAlfanumerico, CampoFixo
+    >>> class Registro0150(Registro):
+    ...     campos = [CampoFixo(1, 'REG', '0150'), CampoAlfanumerico(2, 'COD_PART'),
+    ...               CampoAlfanumerico(3, 'NOME')]
+    >>> tabela = ColunasDoRegistro(Registro0150)
+    >>> tabela.adicionar(['', '0150', 'P1', 'FORNECEDOR', ''], 5)
+    >>> tabela.adicionar(['', '0150', 'P2'], 6)
+    >>> len(tabela), tabela.nomes
+    (2, ['REG', 'COD_PART', 'NOME'])
+    >>> tabela.colunas['NOME'], tabela.numeros_das_linhas
+    (['FORNECEDOR', ''], [5, 6])
+    """
+
+    def __init__(self, registro_class, formato='lista'):
+        if formato not in FORMATOS:
+            raise ValueError('formato inválido: %s (use %s)' % (formato, ', '.join(FORMATOS)))
+        self.registro_class = registro_class
+        self.formato = formato
+        self.nomes = [c.nome for c in registro_class.campos]
+        self._indices = [c.indice for c in registro_class.campos]
+        self._listas = [[] for _ in self.nomes]
+        self._numeros_das_linhas = []
+        self._lote = []
+
+    def __len__(self):
+        return len(self._numeros_das_linhas)
+
+    def __getstate__(self):
+        # Guardar (pickle, sped.cache) apenas as colunas, sem o lote pendente.
+        self._transpor_lote()
+        return self.__dict__
+
+    def __repr__(self):
+        return '<%s.%s(%s, %s linhas)>' % (self.__class__.__module__, self.__class__.__name__,
+                                          self.registro_class.__name__, len(self))
+
+    def adicionar(self, valores, numero_da_linha=None):
+        self._lote.append(valores)
+        self._numeros_das_linhas.append(numero_da_linha)
+        if len(self._lote) >= TAMANHO_DO_LOTE:
+            self._transpor_lote()
+
+    def _transpor_lote(self):
+        # A transposição de um lote inteiro por zip_longest é muito mais rápida
+        # que a inclusão de cada valor em sua coluna, linha a linha.
+        if not self._lote:
+            return
+        transposto = list(zip_longest(*self._lote, fillvalue=''))
+        quantidade = len(self._lote)
+        for lista, indice in zip(self._listas, self._indices):
+            lista.extend(transposto[indice] if indice < len(transposto) else [''] * quantidade)
+        self._lote = []
+
+    @property
+    def numeros_das_linhas(self):
+        return self._converter(self._numeros_das_linhas, numerico=True)
+
+    @property
+    def colunas(self):
+        """Dicionário nome do campo -> coluna, no formato escolhido."""
+        self._transpor_lote()
+        return OrderedDict((nome, self._converter(lista))
+                           for nome, lista in zip(self.nomes, self._listas))
+
+    def coluna(self, nome):
+        self._transpor_lote()
+        return self._converter(self._listas[self.nomes.index(nome)])
+
+    def coluna_inteira(self, nome, vazio=None, precisao=None):
+        """
+        Coluna de um CampoNumerico decodificada em inteiros escalados pela
+        precisão do campo ou pela precisao informada (ver
+        CampoNumerico.decodificar_coluna). Para campos sem precisão declarada,
+        como os da EFD, valores com casas decimais exigem a precisao.
+        """
+        self._transpor_lote()
+        campo = self.registro_class._campos_por_nome[nome]
+        return campo.decodificar_coluna(self._listas[self.nomes.index(nome)],
+                                        self.formato, vazio, precisao)
+
+    def coluna_de_datas(self, nome):
+        """Coluna de um CampoData decodificada (ver CampoData.decodificar_coluna)."""
+        self._transpor_lote()
+        campo = self.registro_class._campos_por_nome[nome]
+        return campo.decodificar_coluna(self._listas[self.nomes.index(nome)], self.formato)
+
+    def _converter(self, lista, numerico=False):
+        if self.formato == 'numpy':
+            import numpy as np
+            return np.array(lista, dtype=np.int64 if numerico else object)
+        if self.formato == 'arrow':
+            import pyarrow as pa
+            return pa.array(lista, type=pa.int64() if numerico else pa.string())
+        return lista
+
+    def dataframe(self):
+        """pandas.DataFrame com uma coluna por campo, indexado por numero_da_linha."""
+        import pandas as pd
+        self._transpor_lote()
+        if self.formato == 'arrow':
+            import pyarrow as pa
+            df = pa.table(self.colunas).to_pandas()
+        else:
+            df = pd.DataFrame(self.colunas, columns=self.nomes)
+        df.index = pd.Index(self._numeros_das_linhas, name='numero_da_linha')
+        return df
+
+
+class ColunasDoArquivo(OrderedDict):
+    """
+    Dicionário REG -> ColunasDoRegistro, na ordem em que os registros
+    aparecem no arquivo.
+    """
+
+    def __init__(self, formato='lista'):
+        super(ColunasDoArquivo, self).__init__()
+        self.formato = formato
+
+    def adicionar(self, registro_class, reg_id, valores, numero_da_linha=None):
+        tabela = self.get(reg_id)
+        if tabela is None:
+            tabela = self[reg_id] = ColunasDoRegistro(registro_class, self.formato)
+        tabela.adicionar(valores, numero_da_linha)
+
+    def dataframes(self):
+        """Dicionário REG -> pandas.DataFrame."""
+        return OrderedDict((reg_id, tabela.dataframe()) for reg_id, tabela in self.items())
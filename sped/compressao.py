@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+
+"""
+Leitura de arquivos SPED compactados (.zip, .gz e .xz), sem descompactá-los
+em disco: o conteúdo é lido diretamente do arquivo compactado.
+
+Um arquivo de dentro de um .zip é indicado pelo caminho do .zip seguido do
+nome do arquivo, como em 'exportados/PISCOFINS.zip/PISCOFINS_2020.txt'. Um
+.zip com um único arquivo também pode ser indicado apenas pelo seu caminho.
+
+>>> import os, tempfile, zipfile
+>>> pasta = tempfile.mkdtemp()
+>>> caminho = os.path.join(pasta, 'sped.zip')
+>>> with zipfile.ZipFile(caminho, 'w') as zf:
+...     zf.writestr('SPED-EFD.txt', b'|0000|a|\\r\\n|9999|2|\\r\\n')
+>>> membros = listar_membros(caminho)
+>>> [os.path.relpath(m, pasta) for m in membros]
+['sped.zip/SPED-EFD.txt']
+>>> with abrir_binario(membros[0]) as arquivo:
+...     arquivo.readline()
+b'|0000|a|\\r\\n'
+>>> with abrir_texto(caminho, 'utf-8') as arquivo:
+...     arquivo.read().splitlines()
+['|0000|a|', '|9999|2|']
+>>> compactado(membros[0]), compactado(pasta)
+(True, False)
+>>> os.remove(caminho); os.rmdir(pasta)
+"""
+
+import importlib
+import io
+import os
+
+# Extensões dos arquivos compactados que contêm um único arquivo e os módulos
+# que os abrem, importados somente quando um desses arquivos é lido.
+_DESCOMPACTAR = {
+    '.gz': 'gzip',
+    '.xz': 'lzma',
+}
+
+EXTENSOES = ('.zip',) + tuple(_DESCOMPACTAR)
+
+
+def separar_membro(filename):
+    """
+    Separa o caminho de um arquivo de dentro de um .zip em (caminho do .zip,
+    nome do arquivo). Para os demais caminhos, retorna (filename, None).
+
+    >>> separar_membro('arquivo.txt')
+    ('arquivo.txt', None)
+    """
+    filename = os.fspath(filename)
+    if os.path.isfile(filename):
+        return filename, None
+    minusculo = filename.lower()
+    posicao = minusculo.find('.zip')
+    while posicao >= 0:
+        fim = posicao + len('.zip')
+        if filename[fim:fim + 1] in ('/', os.sep) and os.path.isfile(filename[:fim]):
+            return filename[:fim], filename[fim + 1:].replace(os.sep, '/')
+        posicao = minusculo.find('.zip', fim)
+    return filename, None
+
+
+def compactado(filename):
+    arquivo, membro = separar_membro(filename)
+    return membro is not None or os.path.splitext(arquivo)[1].lower() in EXTENSOES
+
+
+def nome_descompactado(filename):
+    """
+    Nome do arquivo após a descompactação.
+
+    >>> nome_descompactado('PISCOFINS_2020.txt.gz'), nome_descompactado('a.zip/b.txt')
+    ('PISCOFINS_2020.txt', 'a.zip/b.txt')
+    """
+    raiz, extensao = os.path.splitext(filename)
+    return raiz if extensao.lower() in _DESCOMPACTAR else filename
+
+
+def listar_membros(filename):
+    """
+    Caminhos dos arquivos contidos em um .zip (no formato aceito por
+    abrir_binario). Para os demais arquivos, retorna [filename].
+    """
+    if os.path.splitext(filename)[1].lower() != '.zip':
+        return [filename]
+    import zipfile
+    with zipfile.ZipFile(filename) as zf:
+        return [os.path.join(filename, info.filename) for info in zf.infolist()
+                if not info.is_dir()]
+
+
+def abrir_binario(filename):
+    """
+    Abre filename para leitura em bytes, descompactando o conteúdo à medida
+    que ele é lido quando filename for um .gz, um .xz, um .zip com um único
+    arquivo ou um arquivo de dentro de um .zip.
+    """
+    arquivo, membro = separar_membro(filename)
+    extensao = os.path.splitext(arquivo)[1].lower()
+    if membro is None and extensao in _DESCOMPACTAR:
+        return importlib.import_module(_DESCOMPACTAR[extensao]).open(arquivo, 'rb')
+    if membro is None and extensao != '.zip':
+        return open(arquivo, 'rb')
+    import zipfile
+    # O arquivo de dentro do .zip mantém o .zip aberto até ser fechado.
+    with zipfile.ZipFile(arquivo) as zf:
+        if membro is None:
+            membros = [info.filename for info in zf.infolist() if not info.is_dir()]
+            if len(membros) != 1:
+                raise RuntimeError(u"O arquivo '%s' contém %s arquivos; indique um deles: %s"
+                                   % (arquivo, len(membros), ', '.join(membros)))
+            membro = membros[0]
+        return zf.open(membro)
+
+
+def abrir_texto(filename, codificacao='utf-8'):
+    """Como abrir_binario, mas em modo texto (como open(filename, 'r'))."""
+    return io.TextIOWrapper(abrir_binario(filename), encoding=codificacao, errors='ignore')
+
+
+def assinatura(filename):
+    """
+    (caminho absoluto, (tamanho, data de modificação em ns)) de filename. Para
+    um arquivo de dentro de um .zip, o tamanho e a data são os do .zip.
+    """
+    arquivo, _ = separar_membro(filename)
+    estado = os.stat(arquivo)
+    return os.path.abspath(filename), (estado.st_size, estado.st_mtime_ns)
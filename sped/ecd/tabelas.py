@@ -7,8 +7,6 @@ import sys
 
 __all__ = ['PLANO_REFERENCIAL_PJ_RESUMIDO']
 
-PLANO_REFERENCIAL_PJ_RESUMIDO = []
-
 path_tabelas = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'tabelas')
 # tabela = 'SPEDCONTABIL_DINAMICO_2014$SPEDECF_DINAMICA_P100$12$389'
 tabela = 'SPEDCONTABIL_DINAMICO_2014$SPEDECF_DINAMICA_P150$3$398'
@@ -27,9 +25,23 @@ def carregar_tabela(caminho_tabela, encoding='cp1252'):
 
         return [dict(zip(columns, line.split('|'))) for line in file.readlines()]
 
-if sys.version_info[0] > 2:
-    # Carregamento da tabelas desabilitado no Python 2.7
-    if not PLANO_REFERENCIAL_PJ_RESUMIDO:
-        pj1 = carregar_tabela(os.path.join(path_tabelas, 'SPEDCONTABIL_DINAMICO_2014$SPEDECF_DINAMICA_P100$12$389'))
-        pj2 = carregar_tabela(os.path.join(path_tabelas, 'SPEDCONTABIL_DINAMICO_2014$SPEDECF_DINAMICA_P150$3$398'))
-        PLANO_REFERENCIAL_PJ_RESUMIDO = pj1 + pj2
+def carregar_plano_referencial():
+    if sys.version_info[0] == 2:
+        # Carregamento da tabelas desabilitado no Python 2.7
+        return []
+    pj1 = carregar_tabela(os.path.join(path_tabelas, 'SPEDCONTABIL_DINAMICO_2014$SPEDECF_DINAMICA_P100$12$389'))
+    pj2 = carregar_tabela(os.path.join(path_tabelas, 'SPEDCONTABIL_DINAMICO_2014$SPEDECF_DINAMICA_P150$3$398'))
+    return pj1 + pj2
+
+def __getattr__(name):
+    # As tabelas são lidas no primeiro acesso a PLANO_REFERENCIAL_PJ_RESUMIDO,
+    # e não na importação do módulo.
+    if name == 'PLANO_REFERENCIAL_PJ_RESUMIDO':
+        valor = globals()[name] = carregar_plano_referencial()
+        return valor
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+
+if sys.version_info < (3, 7):
+    # Sem __getattr__ de módulo (PEP 562), as tabelas são lidas na importação.
+    PLANO_REFERENCIAL_PJ_RESUMIDO = carregar_plano_referencial()
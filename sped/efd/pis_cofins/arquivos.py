@@ -18,6 +18,24 @@ from .registros import Registro9999
 
 
 class ArquivoDigital(arquivos.ArquivoDigital):
+    """
+    Arquivo digital da EFD - PIS/COFINS. Os modos de leitura (readfile,
+    iter_registros, ler_colunas, ...) são descritos em sped.arquivos e
+    testados em test/arquivos_test.py.
+
+    >>> import os, tempfile
+    >>> linhas = ['|0000|006|0|||01012019|31012019|EMPRESA TESTE|11111111000191|SP|3550308||00|0|',
+    ...           '|0001|0|', '|0990|3|', '|9001|0|', '|9990|2|', '|9999|6|']
+    >>> with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as f:
+    ...     _ = f.write('\\r\\n'.join(linhas) + '\\r\\n')
+    >>> arquivo = ArquivoDigital()
+    >>> arquivo.readfile(f.name)
+    >>> arquivo._registro_abertura.NOME, arquivo.leitura_completa
+    ('EMPRESA TESTE', True)
+    >>> [r.REG for r in arquivo.iter_registros(f.name, blocos={'9'})]
+    ['0000', '9001', '9990', '9999']
+    >>> os.remove(f.name)
+    """
     registro_abertura = Registro0000
     registro_encerramento = Registro9999
     registros = registros
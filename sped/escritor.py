@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+
+"""
+Gravação de arquivos SPED registro a registro, em memória constante.
+
+Os registros são recebidos na ordem do arquivo e gravados já codificados,
+em blocos grandes. As quantidades de linhas de cada bloco e de cada registro
+são contadas à medida que os registros são gravados, de modo que os
+registros de encerramento dos blocos (X990) e o bloco 9 (9001, 9900, 9990
+e 9999) são gerados pelo próprio escritor, sem que os registros anteriores
+precisem ficar em memória.
+"""
+
+from .compressao import EXTENSOES
+from .registros import Registro
+
+# Quantidade aproximada de caracteres acumulados antes de cada gravação.
+TAMANHO_DO_BUFFER = 2 ** 20
+
+FIM_DE_LINHA = '\r\n'
+
+
+class EscritorDeArquivo(object):
+    """
+    Recebe os registros (objetos Registro ou linhas no formato '|REG|...|')
+    a partir do registro de abertura do arquivo (0000) e grava:
+
+    - o registro de abertura de cada bloco (X001, com IND_MOV 0), caso ele
+      não tenha sido informado;
+    - o registro de encerramento de cada bloco (X990) com a quantidade de
+      linhas do bloco, no lugar do que tiver sido informado;
+    - ao final (fechar), o bloco 9: 9001, um 9900 por registro, 9990 e 9999.
+      Registros do bloco 9 informados são ignorados.
+
+    Campos que dependem do total de linhas do arquivo em outros registros
+    (por exemplo, QTD_LIN dos registros I030 e J900 da ECD) devem ser
+    preenchidos por quem gera os registros.
+
+    >>> from io import BytesIO
+    >>> destino = BytesIO()
+    >>> with EscritorDeArquivo(destino) as escritor:
+    ...     escritor.escrever('|0000|EMPRESA|')
+    ...     escritor.escrever('|0001|0|')
+    ...     escritor.escrever_registros(['|0150|P1|', '|0150|P2|'])
+    ...     escritor.escrever('|C100|1|')
+    >>> texto = destino.getvalue().decode('utf-8')
+    >>> texto.count('\\r\\n')
+    22
+    >>> print(texto.replace('\\r\\n', '\\n'), end='')
+    |0000|EMPRESA|
+    |0001|0|
+    |0150|P1|
+    |0150|P2|
+    |0990|5|
+    |C001|0|
+    |C100|1|
+    |C990|3|
+    |9001|0|
+    |9900|0000|1|
+    |9900|0001|1|
+    |9900|0150|2|
+    |9900|0990|1|
+    |9900|C001|1|
+    |9900|C100|1|
+    |9900|C990|1|
+    |9900|9001|1|
+    |9900|9900|11|
+    |9900|9990|1|
+    |9900|9999|1|
+    |9990|14|
+    |9999|22|
+    >>> escritor.quantidade_de_linhas, escritor.quantidades['0150']
+    (22, 2)
+    """
+
+    def __init__(self, destino, codificacao='utf-8', tamanho_do_buffer=TAMANHO_DO_BUFFER):
+        """
+        destino é o caminho do arquivo a ser criado ou um arquivo já aberto
+        em modo binário.
+        """
+        if isinstance(destino, str):
+            if destino.lower().endswith(EXTENSOES):
+                raise RuntimeError(u"Gravação compactada não suportada: '%s'." % destino)
+            self._arquivo = open(destino, 'wb')
+            self._fechar_arquivo = True
+        else:
+            self._arquivo = destino
+            self._fechar_arquivo = False
+        self.codificacao = codificacao
+        self.tamanho_do_buffer = tamanho_do_buffer
+        # Quantidade de linhas de cada registro (REG), na ordem em que aparecem.
+        self.quantidades = {}
+        self.quantidade_de_linhas = 0
+        self._bloco = None
+        self._blocos_encerrados = set()
+        self._linhas_do_bloco = 0
+        self._buffer = []
+        # Linhas acumuladas antes de cada gravação, estimadas a partir do
+        # tamanho médio das linhas já gravadas (ver _esvaziar).
+        self._linhas_por_gravacao = 1024
+        self._fechado = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, rastreamento):
+        if tipo is None:
+            self.fechar()
+        elif self._fechar_arquivo:
+            self._arquivo.close()
+
+    def escrever(self, registro):
+        if isinstance(registro, Registro):
+            linha = registro.as_line()
+        else:
+            linha = registro.rstrip('\r\n')
+        reg_id = linha[1:5]
+        if reg_id[:1] == self._bloco and reg_id[1:] != '990':
+            # Caso mais frequente: mais um registro do bloco em andamento.
+            self._gravar(reg_id, linha)
+            self._linhas_do_bloco += 1
+            return
+        if self.quantidade_de_linhas == 0 and reg_id != '0000':
+            raise RuntimeError(u"O primeiro registro deve ser o 0000, e não o %s." % reg_id)
+        if self._fechado:
+            raise RuntimeError(u"O arquivo já foi encerrado (registro %s)." % reg_id)
+        bloco_id = reg_id[:1]
+        if bloco_id == '9':
+            return
+        if reg_id == '0000':
+            self._gravar(reg_id, linha)
+            return
+        if bloco_id in self._blocos_encerrados:
+            raise RuntimeError(u"Registro %s fora da ordem: o bloco %s já foi encerrado."
+                               % (reg_id, bloco_id))
+        if bloco_id != self._bloco:
+            self._abrir_bloco(bloco_id, reg_id, linha)
+            if reg_id == bloco_id + '001':
+                return
+        if reg_id[1:] == '990':
+            # O encerramento do bloco é gerado com a quantidade de linhas contada.
+            self._encerrar_bloco()
+            return
+        self._gravar(reg_id, linha)
+        self._linhas_do_bloco += 1
+
+    def escrever_registros(self, registros):
+        for registro in registros:
+            self.escrever(registro)
+
+    def fechar(self):
+        """Encerra o último bloco, grava o bloco 9 e esvazia o buffer."""
+        if self._fechado:
+            return
+        if self._bloco is not None:
+            self._encerrar_bloco()
+        self._gravar('9001', '|9001|0|')
+        # Um 9900 para cada registro do arquivo, inclusive os do próprio bloco 9.
+        registros = list(self.quantidades) + ['9900', '9990', '9999']
+        quantidades = dict(self.quantidades, **{'9900': len(registros), '9990': 1, '9999': 1})
+        for reg_id in registros:
+            self._gravar('9900', '|9900|%s|%s|' % (reg_id, quantidades[reg_id]))
+        self._gravar('9990', '|9990|%s|' % (len(registros) + 3))
+        self._gravar('9999', '|9999|%s|' % (self.quantidade_de_linhas + 1))
+        self._esvaziar()
+        self._fechado = True
+        if self._fechar_arquivo:
+            self._arquivo.close()
+        else:
+            self._arquivo.flush()
+
+    def _abrir_bloco(self, bloco_id, reg_id, linha):
+        if self._bloco is not None:
+            self._encerrar_bloco()
+        self._bloco = bloco_id
+        self._linhas_do_bloco = 1
+        abertura = bloco_id + '001'
+        self._gravar(abertura, linha if reg_id == abertura else '|%s|0|' % abertura)
+
+    def _encerrar_bloco(self):
+        encerramento = self._bloco + '990'
+        # No bloco 0, a quantidade de linhas inclui o registro 0000.
+        linhas = self._linhas_do_bloco + 1 + (self._bloco == '0')
+        self._gravar(encerramento, '|%s|%s|' % (encerramento, linhas))
+        self._blocos_encerrados.add(self._bloco)
+        # Sem bloco em andamento, registros do bloco encerrado não passam
+        # pelo caso mais frequente de escrever e são recusados.
+        self._bloco = None
+
+    def _gravar(self, reg_id, linha):
+        quantidades = self.quantidades
+        quantidades[reg_id] = quantidades.get(reg_id, 0) + 1
+        self.quantidade_de_linhas += 1
+        self._buffer.append(linha)
+        if len(self._buffer) >= self._linhas_por_gravacao:
+            self._esvaziar()
+
+    def _esvaziar(self):
+        if self._buffer:
+            self._buffer.append('')
+            texto = FIM_DE_LINHA.join(self._buffer)
+            self._arquivo.write(texto.encode(self.codificacao))
+            self._linhas_por_gravacao = max(1, self.tamanho_do_buffer * len(self._buffer)
+                                            // max(1, len(texto)))
+            self._buffer = []
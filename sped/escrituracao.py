@@ -15,7 +15,10 @@ from .blocos import Bloco
 from .registros import Registro
 
 import json
+import os
+import pickle
 import re
+import tempfile
 import types
 
 
@@ -24,6 +27,190 @@ ECF='ecf'
 EFD_ICMS_IPI='efd_icms_ipi'
 EFD_PIS_COFINS='efd_pis_cofins'
 
+# Versão do formato dos leiautes compilados guardados em disco (ver ler_leiaute).
+FORMATO_DO_LEIAUTE = 1
+
+_FIXO_ENTRE_ASPAS = re.compile(r'"([a-z0-9]+)"', re.IGNORECASE)
+_FIXO_ENTRE_COLCHETES = re.compile(r'\[([a-z0-9]+)\]', re.IGNORECASE)
+_VALORES_VALIDOS = re.compile(r'\[([^\]]+)\]')
+
+# Classes geradas de cada leiaute, por (tipo, ano_calendario).
+_classes_dos_leiautes = {}
+
+
+def _campos_do_registro(registro):
+    """Cria os campos de um registro do leiaute JSON, conforme os valores, regras e tipo de cada um."""
+    campos = []
+
+    for campo in registro['campos']:
+        indice = campo['indice']
+        nome = campo['nome']
+        valores = campo['valores']
+        regras = campo['regras']
+        tipo = campo['tipo']
+        obrigatorio = campo['obrigatorio']
+
+        # Campos Fixo
+        m = _FIXO_ENTRE_ASPAS.match(valores)
+        if m:
+            campos.append(CampoFixo(indice, nome, m.group(1)))
+            continue
+
+        m = _FIXO_ENTRE_COLCHETES.match(valores)
+        if m:
+            campos.append(CampoFixo(indice, nome, m.group(1)))
+            continue
+
+        # Campos Regex
+        m = _VALORES_VALIDOS.match(valores)
+        if m:
+            valoresValidos = m.groups()[0].replace(' ', '').replace('"', '').replace('\n', '').replace(',', ';').split(';')
+            if set(valoresValidos) == set(['S', 'N']):
+                campos.append(CampoBool(indice, nome, obrigatorio=obrigatorio))
+                continue
+            else:
+                campos.append(CampoRegex(indice, nome, obrigatorio=obrigatorio, regex='|'.join(valoresValidos)))
+                continue
+
+        # Campos Data
+        if nome.startswith('DT_') or nome.startswith('DATA_'):
+            campos.append(CampoData(indice, nome, obrigatorio=obrigatorio))
+            continue
+
+        # Campo CNPJ ou CPF
+        if 'REGRA_VALIDA_CNPJ' in regras and 'REGRA_VALIDA_CPF' in regras or nome == 'IDENT_CPF_CNPJ' or nome == 'CPF_CNPJ':
+            campos.append(CampoCPFouCNPJ(indice, nome, obrigatorio=obrigatorio))
+            continue
+
+        # Campo CNPJ
+        if 'REGRA_VALIDA_CNPJ' in regras or nome == 'CNPJ':
+            campos.append(CampoCNPJ(indice, nome, obrigatorio=obrigatorio))
+            continue
+
+        # Campo CPF
+        if 'REGRA_VALIDA_CPF' in regras:
+            campos.append(CampoCPF(indice, nome, obrigatorio=obrigatorio))
+            continue
+
+        # CampoAlfaNumerico
+        if tipo == 'C':
+            campos.append(CampoAlfanumerico(indice, nome, obrigatorio=obrigatorio, tamanho=campo['tamanho']))
+            continue
+
+        # Campos Decimal
+        if tipo == 'N':
+            campos.append(CampoNumerico(indice, nome, obrigatorio=obrigatorio, precisao=campo['decimal']))
+            continue
+
+        # Campos Decimal
+        if tipo == 'NS':
+            campos.append(CampoNumerico(indice, nome, obrigatorio=obrigatorio, precisao=campo['decimal']))
+            continue
+
+        # CampoNumerico
+        if indice is not None:
+            campos.append(Campo(indice, nome, obrigatorio=obrigatorio))
+
+    return campos
+
+
+def _compilar_leiaute(leiaute_path):
+    """
+    Lê o leiaute JSON e cria os campos de cada registro. Retorna
+    (nomes dos blocos, [(código, nome, campos) de cada registro]).
+    """
+    with leiaute_path.open(encoding='utf-8', newline='\n') as f:
+        p = json.load(f)
+
+    blocos = [bloco['nome'] for bloco in p['blocos']]
+    registros = [(registro['codigo'], registro['nome'], _campos_do_registro(registro))
+                 for registro in p['registros']]
+    return blocos, registros
+
+
+def ler_leiaute(tipo: str, ano_calendario: int):
+    """
+    Leiaute compilado (ver _compilar_leiaute) de (tipo, ano_calendario).
+
+    O resultado é guardado (pickle) em leiautes/__pycache__, junto com o
+    tamanho e a data de modificação do JSON e a versão da biblioteca, e
+    reaproveitado enquanto nenhum deles mudar. Se a pasta não puder ser
+    gravada, o leiaute é apenas compilado, como ocorre com os arquivos .pyc.
+    """
+    from . import __version__
+
+    leiaute_path = Path(__file__).parent / 'leiautes' / ('%s_%s.json' % (tipo, ano_calendario))
+    estado = leiaute_path.stat()
+    assinatura = (FORMATO_DO_LEIAUTE, __version__, estado.st_size, estado.st_mtime_ns)
+    compilado_path = leiaute_path.parent / '__pycache__' / (leiaute_path.stem + '.pickle')
+
+    try:
+        with compilado_path.open('rb') as f:
+            guardada, leiaute = pickle.load(f)
+        if guardada == assinatura:
+            return leiaute
+    except (OSError, EOFError, ValueError, pickle.UnpicklingError, AttributeError, ImportError):
+        # Ainda não compilado, corrompido ou de uma versão incompatível do código.
+        pass
+
+    leiaute = _compilar_leiaute(leiaute_path)
+    try:
+        compilado_path.parent.mkdir(exist_ok=True)
+        descritor, temporario = tempfile.mkstemp(dir=str(compilado_path.parent), suffix='.tmp')
+        with os.fdopen(descritor, 'wb') as f:
+            pickle.dump((assinatura, leiaute), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temporario, str(compilado_path))
+    except OSError:
+        pass
+    return leiaute
+
+
+class _ClassesDoLeiaute(object):
+    """
+    Classes de registro geradas de um leiaute, com os campos, compartilhadas
+    por todas as escriturações de mesmo (tipo, ano_calendario). Cada
+    escrituração usa subclasses delas (ver vincular) em que o atributo
+    escrituracao se refere a ela.
+    """
+
+    def __init__(self, tipo: str, ano_calendario: int):
+        blocos, registros = ler_leiaute(tipo, ano_calendario)
+
+        self.registro_escrituracao = type('Registro', (Registro,), { 'escrituracao': None })
+        self.classes = []
+
+        self.registro_abertura = None
+        self.registro_encerramento = None
+        # Classes dos registros de abertura e de encerramento de cada bloco.
+        self.blocos = {nome: [None, None] for nome in blocos}
+
+        for codigo, nome_registro, campos in registros:
+            r = type('Registro' + codigo, (self.registro_escrituracao,), { 'campos': campos })
+            if re.match(r'ABERTURA DO ARQUIVO DIGITAL', nome_registro):
+                self.registro_abertura = r
+            if re.match(r'ENCERRAMENTO DO ARQUIVO DIGITAL', nome_registro):
+                self.registro_encerramento = r
+            m = re.match(r'ABERTURA DO BLOCO (.)', nome_registro)
+            if m:
+                self.blocos[m.group(1)][0] = r
+            m = re.match(r'ENCERRAMENTO DO BLOCO (.)', nome_registro)
+            if m:
+                self.blocos[m.group(1)][1] = r
+            self.classes.append(r)
+
+    def vincular(self, escrituracao):
+        """
+        Subclasses das classes do leiaute com escrituracao como atributo.
+        Retorna (registro_escrituracao, {classe do leiaute: subclasse}). Os
+        campos e os mapas de campos são herdados, e não criados de novo.
+        """
+        base = type('Registro', (self.registro_escrituracao,),
+                    { 'escrituracao': escrituracao, '__module__': __name__ })
+        subclasses = {classe: type(classe.__name__, (classe, base), { '__module__': __name__ })
+                      for classe in self.classes}
+        return base, subclasses
+
+
 class Escrituracao(object):
     """
     >>> escrituracao = Escrituracao(ECD, 2016)
@@ -47,8 +234,8 @@ class Escrituracao(object):
     <sped.escrituracao.Registro0000>
     >>> isinstance(registro, escrituracao._registro_escrituracao)
     True
-    >>> registro.escrituracao
-    <sped.escrituracao.Escrituracao(ecd, 2017)>
+    >>> registro.escrituracao is escrituracao
+    True
     >>> registro.IDENT_MF = 'M'
     Traceback (most recent call last):
     ...
@@ -72,117 +259,47 @@ class Escrituracao(object):
     >>> escrituracao = Escrituracao(ECF, 2017)
     >>> escrituracao
     <sped.escrituracao.Escrituracao(ecf, 2017)>
+    >>> outra = Escrituracao(ECF, 2017)
+    >>> outra.registros.Registro0000().escrituracao is outra
+    True
+    >>> outra.registros.Registro0000 is escrituracao.registros.Registro0000
+    False
+    >>> outra.registros.Registro0000.campos is escrituracao.registros.Registro0000.campos
+    True
+    >>> Escrituracao(ECF, 2017).blocos['0'] is escrituracao.blocos['0']
+    False
     """
     def __init__(self, tipo: str, ano_calendario: int):
         self._tipo = tipo
         self._ano_calendario = ano_calendario
 
-        self._registros = types.ModuleType('registros')
         self._blocos = {}
+        # Quantidade de cada registro (REG) incluído por add, por bloco.
+        self._quantidades = {}
 
-        self._registro_escrituracao = type('Registro', (Registro,), { 'escrituracao': self })
-        self._add_registro(self._registro_escrituracao)
+        # O leiaute é lido e as classes dos registros são geradas uma única
+        # vez por processo, para cada (tipo, ano_calendario).
+        classes = _classes_dos_leiautes.get((tipo, ano_calendario))
+        if classes is None:
+            classes = _classes_dos_leiautes[(tipo, ano_calendario)] = _ClassesDoLeiaute(tipo, ano_calendario)
 
-        sped_path = Path(__file__).parent
-
-        leiaute_path = '%s/leiautes/%s_%s.json' % (sped_path, self._tipo,
-                                                   self._ano_calendario)
-        leiaute_ecd = Path(leiaute_path)
-
-        with leiaute_ecd.open(encoding='utf-8', newline='\n') as f:
-            p = json.load(f)
-
-        for bloco in p['blocos']:
-            self._blocos[bloco['nome']] = Bloco(bloco['nome'])
-
-        for registro in p['registros']:
-            campos = []
-
-            for campo in registro['campos']:
-                indice = campo['indice']
-                nome = campo['nome']
-                valores = campo['valores']
-                regras = campo['regras']
-                tipo = campo['tipo']
-                obrigatorio = campo['obrigatorio']
-
-                # Campos Fixo
-                m = re.match(r'"([a-z0-9]+)"', valores, re.IGNORECASE)
-                if m:
-                    campos.append(CampoFixo(indice, nome, m.group(1)))
-                    continue
-
-                m = re.match(r'\[([a-z0-9]+)\]', valores, re.IGNORECASE)
-                if m:
-                    campos.append(CampoFixo(indice, nome, m.group(1)))
-                    continue
-
-                # Campos Regex
-                m = re.match(r'\[([^\]]+)\]', valores)
-                if m:
-                    valoresValidos = m.groups()[0].replace(' ', '').replace('"', '').replace('\n', '').replace(',', ';').split(';')
-                    if set(valoresValidos) == set(['S', 'N']):
-                        campos.append(CampoBool(indice, nome, obrigatorio=obrigatorio))
-                        continue
-                    else:
-                        campos.append(CampoRegex(indice, nome, obrigatorio=obrigatorio, regex='|'.join(valoresValidos)))
-                        continue
-
-                # Campos Data
-                if nome.startswith('DT_') or nome.startswith('DATA_'):
-                    campos.append(CampoData(indice, nome, obrigatorio=obrigatorio))
-                    continue
-
-                # Campo CNPJ ou CPF
-                if 'REGRA_VALIDA_CNPJ' in regras and 'REGRA_VALIDA_CPF' in regras or nome == 'IDENT_CPF_CNPJ' or nome == 'CPF_CNPJ':
-                    campos.append(CampoCPFouCNPJ(indice, nome, obrigatorio=obrigatorio))
-                    continue
-
-                # Campo CNPJ
-                if 'REGRA_VALIDA_CNPJ' in regras or nome == 'CNPJ':
-                    campos.append(CampoCNPJ(indice, nome, obrigatorio=obrigatorio))
-                    continue
-
-                # Campo CPF
-                if 'REGRA_VALIDA_CPF' in regras:
-                    campos.append(CampoCPF(indice, nome, obrigatorio=obrigatorio))
-                    continue
-
-                # CampoAlfaNumerico
-                if tipo == 'C':
-                    campos.append(CampoAlfanumerico(indice, nome, obrigatorio=obrigatorio, tamanho=campo['tamanho']))
-                    continue
-
-                # Campos Decimal
-                if tipo == 'N':
-                    campos.append(CampoNumerico(indice, nome, obrigatorio=obrigatorio, precisao=campo['decimal']))
-                    continue
-
-                # Campos Decimal
-                if tipo == 'NS':
-                    campos.append(CampoNumerico(indice, nome, obrigatorio=obrigatorio, precisao=campo['decimal']))
-                    continue
-
-                # CampoNumerico
-                if indice is not None:
-                    campos.append(Campo(indice, nome, obrigatorio=obrigatorio))
-
-            nome_registro = registro['nome']
-            r = type('Registro' + registro['codigo'], (self._registro_escrituracao,), { 'campos': campos })
-            if re.match(r'ABERTURA DO ARQUIVO DIGITAL', nome_registro):
-                self.registro_abertura = r()
-            if re.match(r'ENCERRAMENTO DO ARQUIVO DIGITAL', nome_registro):
-                self.registro_encerramento = r()
-            m = re.match(r'ABERTURA DO BLOCO (.)', nome_registro)
-            if m:
-                self._blocos[m.group(1)].registro_abertura = r()
-            m = re.match(r'ENCERRAMENTO DO BLOCO (.)', nome_registro)
-            if m:
-                self._blocos[m.group(1)].registro_encerramento = r()
-            self._add_registro(r)
-
-    def _add_registro(self, registro: type):
-        setattr(self._registros, registro.__name__, registro)
+        # Subclasses em que registro.escrituracao é esta escrituração.
+        self._registro_escrituracao, subclasses = classes.vincular(self)
+        self._registros = types.ModuleType('registros')
+        self._add_registro(self._registro_escrituracao)
+        for subclasse in subclasses.values():
+            self._add_registro(subclasse)
+
+        for nome, (abertura, encerramento) in classes.blocos.items():
+            bloco = self._blocos[nome] = Bloco(nome)
+            if abertura is not None:
+                bloco.registro_abertura = subclasses[abertura]()
+            if encerramento is not None:
+                bloco.registro_encerramento = subclasses[encerramento]()
+        if classes.registro_abertura is not None:
+            self.registro_abertura = subclasses[classes.registro_abertura]()
+        if classes.registro_encerramento is not None:
+            self.registro_encerramento = subclasses[classes.registro_encerramento]()
 
     @property
     def blocos(self) -> list:
@@ -192,56 +309,138 @@ class Escrituracao(object):
     def registros(self) -> types.ModuleType:
         return self._registros
 
+    def _add_registro(self, registro: type):
+        setattr(self._registros, registro.__name__, registro)
+
     def prepare(self):
+        """
+        Monta o bloco 9 e as quantidades de linhas a partir das contagens
+        mantidas por add, sem percorrer os registros. Um bloco com registros
+        incluídos diretamente (bloco.add) é recontado. Pode ser chamado mais
+        de uma vez: o bloco 9 é refeito a cada chamada.
+        """
         bloco_9 = self._blocos['9']
+        bloco_9._registros = []
 
-        for bloco in self._blocos.values():
-            regs = {}
+        for bloco_id, bloco in self._blocos.items():
+            quantidades = self._quantidades.get(bloco_id, {})
+            if bloco_id != '9' and sum(quantidades.values()) != len(bloco._registros):
+                quantidades = self._quantidades[bloco_id] = self._contar_registros(bloco)
 
-            for reg in bloco.registros:
-                if reg.REG not in regs:
-                    regs[reg.REG] = 0
-                regs[reg.REG] += 1
+            regs = {bloco.registro_abertura.REG: 1}
+            regs.update(quantidades)
+            if bloco_id == '9':
+                # Um 9900 para cada registro anterior e para 9001, 9900, 9990 e 9999.
+                regs['9900'] = len(bloco_9._registros) + 4
+            regs[bloco.registro_encerramento.REG] = 1
 
-            if bloco == self._blocos['0']:
+            if bloco_id == '0':
                 regs['0000'] = 1
 
-            if bloco == bloco_9:
+            if bloco_id == '9':
                 regs['9999'] = 1
-                regs['9900'] += len(regs.keys())
+            else:
+                bloco.registro_encerramento[2] = sum(regs.values())
 
-            for reg in regs.keys():
+            for reg, quantidade in regs.items():
                 registro = self.registros.Registro9900() # pylint: disable=E1101
-                try:
-                    registro.REG_BLC = reg
-                except:
-                    for rrr in bloco.registros:
-                        print(rrr)
-                    print(locals())
-                    raise
-                registro.QTD_REG_BLC = regs[reg]
+                registro.REG_BLC = reg
+                registro.QTD_REG_BLC = quantidade
                 bloco_9.add(registro)
 
+        bloco_9.registro_encerramento[2] = len(bloco_9) + 1
+
         reg_count = 2
         for bloco in self._blocos.values():
-            reg_count += len(bloco.registros)
+            reg_count += len(bloco)
 
         self.registro_encerramento[2] = reg_count
 
+    @staticmethod
+    def _contar_registros(bloco):
+        quantidades = {}
+        for registro in bloco._registros:
+            reg_id = registro.valores[1]
+            quantidades[reg_id] = quantidades.get(reg_id, 0) + 1
+        return quantidades
+
     def write_to(self, buff):
-        buff.write('%s\r\n' % self.registro_abertura)
+        """
+        Grava a escrituração montada em memória. Para gravar registro a
+        registro, sem mantê-los em memória, ver sped.escritor.EscritorDeArquivo.
+        """
+        buff.write(self.registro_abertura.as_line() + '\r\n')
         reg_count = 2
         for bloco in self._blocos.values():
-            reg_count += len(bloco.registros)
-            for registro in bloco.registros:
-                buff.write('%s\r\n' % registro)
+            reg_count += len(bloco)
+            buff.writelines(registro.as_line() + '\r\n' for registro in bloco.iter_registros())
 
         self.registro_encerramento[2] = reg_count
 
         buff.write('%s\r\n' % self.registro_encerramento)
 
     def add(self, registro: Registro):
-        pass
+        """
+        Inclui o registro no bloco indicado pelo seu código (REG) e atualiza
+        as contagens por bloco e por registro usadas por prepare.
+
+        >>> escrituracao = Escrituracao(ECD, 2017)
+        >>> registro = escrituracao.registros.Registro0007()
+        >>> registro.COD_ENT_REF = '00'
+        >>> escrituracao.add(registro)
+        >>> escrituracao.add(escrituracao.registros.RegistroI010('|I010|G|9.00|'))
+        >>> escrituracao.prepare()
+        >>> escrituracao.prepare()
+        >>> [r.as_line() for r in escrituracao.blocos['9']._registros][:4]
+        ['|9900|0001|1|', '|9900|0007|1|', '|9900|0990|1|', '|9900|0000|1|']
+        >>> escrituracao.blocos['0'].registro_encerramento.as_line()
+        '|0990|4|'
+        >>> from io import StringIO
+        >>> buff = StringIO()
+        >>> escrituracao.write_to(buff)
+        >>> escrituracao.registro_encerramento.QTD_LIN == buff.getvalue().count('\\r\\n')
+        True
+        """
+        reg_id = registro.valores[1]
+        classe = registro.__class__
+        if classe is self.registro_abertura.__class__:
+            self.registro_abertura = registro
+            return
+        if classe is self.registro_encerramento.__class__:
+            self.registro_encerramento = registro
+            return
+
+        bloco_id = reg_id[:1]
+        bloco = self._blocos.get(bloco_id)
+        if bloco is None:
+            raise RuntimeError(u"Registro %s não pertence a nenhum bloco da escrituração %s."
+                               % (reg_id, self._tipo))
+        if classe is bloco.registro_abertura.__class__:
+            bloco.registro_abertura = registro
+        elif classe is bloco.registro_encerramento.__class__:
+            bloco.registro_encerramento = registro
+        elif bloco_id != '9':
+            # Os registros 9900 são gerados por prepare.
+            bloco.add(registro)
+            quantidades = self._quantidades.setdefault(bloco_id, {})
+            quantidades[reg_id] = quantidades.get(reg_id, 0) + 1
+
+    def extend_rows(self, registro_class: type, rows) -> int:
+        """
+        Inclui um registro de registro_class para cada linha de rows (ver
+        Bloco.extend_rows), atualizando as contagens usadas por prepare.
+        """
+        reg_id = registro_class().valores[1]
+        bloco_id = reg_id[:1]
+        bloco = self._blocos.get(bloco_id)
+        if bloco is None or bloco_id == '9':
+            raise RuntimeError(u"Registro %s não pertence a nenhum bloco da escrituração %s."
+                               % (reg_id, self._tipo))
+        quantidade = bloco.extend_rows(registro_class, rows)
+        if quantidade:
+            quantidades = self._quantidades.setdefault(bloco_id, {})
+            quantidades[reg_id] = quantidades.get(reg_id, 0) + quantidade
+        return quantidade
 
     def __repr__(self):
         return '<%s.%s(%s, %s)>' % (self.__class__.__module__,
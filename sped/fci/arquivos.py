@@ -38,12 +38,13 @@ class ArquivoDigital(arquivos.ArquivoDigital):
         reg_id = line.split('|')[1]
 
         try:
-            registro_class = \
-                getattr(self.__class__.registros, 'Registro' + reg_id)
-        except AttributeError:
+            registro_class = self._tabela_de_despacho()[reg_id][0]
+        except KeyError:
             raise RuntimeError(u"Arquivo inválido para FCI")
 
-        registro = registro_class(line)
+        if registro_class == self.__class__.registro_abertura:
+            self.contexto.reiniciar()
+        registro = registro_class(line, self.contexto.proxima_linha())
         if registro.__class__ == self.__class__.registro_abertura:
             self._registro_abertura = registro
         elif registro.__class__ == self.__class__.registro_encerramento:
@@ -0,0 +1,234 @@
+# -*- coding: utf-8 -*-
+
+"""
+Índice de posições (em bytes) das linhas de um arquivo SPED.
+
+O arquivo é percorrido uma única vez, via mmap e sem decodificar o texto,
+guardando para cada linha a posição inicial e o código do registro (REG).
+O índice é gravado em um arquivo auxiliar ('<arquivo>.idx') e reaproveitado
+enquanto o tamanho e a data de modificação do arquivo SPED não mudarem.
+
+Com o índice é possível ler uma linha pelo seu número, ou todas as linhas de
+um registro ou de um bloco, sem processar o restante do arquivo.
+"""
+
+import mmap
+import os
+import struct
+from array import array
+
+from .compressao import compactado
+from .tokenizador import separar_campos
+
+EXTENSAO = '.idx'
+
+# Cabeçalho do arquivo auxiliar: identificação e versão do formato, tamanho e
+# data de modificação (ns) do arquivo SPED, número de linhas e tamanho da
+# lista de códigos de registro.
+_ASSINATURA = b'SPEDIDX1'
+_CABECALHO = struct.Struct('<8sQQQI')
+
+
+class IndiceDeArquivo(object):
+    """
+    >>> import os, tempfile
+    >>> linhas = [b'|0000|EMPRESA|', b'|0001|0|', b'|0150|1|', b'|0150|2|',
+    ...           b'|0990|5|', b'|C001|1|', b'|C990|2|', b'|9999|8|']
+    >>> with tempfile.NamedTemporaryFile('wb', suffix='.txt', delete=False) as f:
+    ...     _ = f.write(b'\\r\\n'.join(linhas) + b'\\r\\n')
+    >>> indice = IndiceDeArquivo.construir(f.name)
+    >>> len(indice)
+    8
+    >>> indice.linha(3)
+    b'|0150|1|\\r'
+    >>> indice.numeros_das_linhas('0150')
+    [3, 4]
+    >>> [linha for numero, linha in indice.linhas_do_bloco('C')]
+    [b'|C001|1|\\r', b'|C990|2|\\r']
+    >>> indice.salvar()
+    >>> carregado = IndiceDeArquivo.carregar(f.name)
+    >>> carregado.numeros_das_linhas('C990'), carregado.registros()
+    ([7], ['0000', '0001', '0150', '0990', 'C001', 'C990', '9999'])
+    >>> with open(f.name, 'ab') as arquivo:
+    ...     _ = arquivo.write(b'|0150|3|\\r\\n')
+    >>> IndiceDeArquivo.carregar(f.name) is None # o arquivo SPED foi alterado
+    True
+    >>> len(indexar(f.name)) # a linha incluída após o 9999 não é indexada
+    8
+    >>> os.remove(f.name + EXTENSAO)
+    >>> os.remove(f.name)
+
+    Arquivo assinado: as linhas após o registro 9999 não são indexadas.
+
+    >>> with tempfile.NamedTemporaryFile('wb', suffix='.txt', delete=False) as f:
+    ...     _ = f.write(b'\\r\\n'.join(linhas) + b'\\r\\nSBRCAAEPDR\\x00\\xff\\n|0150|\\x01\\n\\xfe')
+    >>> indice = IndiceDeArquivo.construir(f.name)
+    >>> len(indice), indice.registros()[-1], indice.linha(8)
+    (8, '9999', b'|9999|8|\\r')
+    >>> os.remove(f.name)
+    """
+
+    def __init__(self, filename, posicoes, codigos, registros, assinatura_do_arquivo):
+        self.filename = filename
+        # posicoes[i] é o início da linha i + 1; o último elemento é o tamanho do arquivo.
+        self._posicoes = posicoes
+        # codigos[i] é o índice do REG da linha i + 1 em registros.
+        self._codigos = codigos
+        self._registros = registros
+        self._assinatura_do_arquivo = assinatura_do_arquivo
+        self._linhas_por_registro = None
+
+    def __len__(self):
+        return len(self._codigos)
+
+    def __repr__(self):
+        return '<%s.%s(%s)>' % (self.__class__.__module__,
+                                self.__class__.__name__, self.filename)
+
+    @classmethod
+    def construir(cls, filename):
+        posicoes = array('Q')
+        codigos = array('H')
+        registros = []
+        codigo_do_registro = {}
+        if compactado(filename):
+            raise RuntimeError(u"Não é possível indexar o arquivo compactado: '%s'." % filename)
+        with open(filename, 'rb') as arquivo:
+            assinatura = _assinatura_do_arquivo(arquivo.fileno())
+            tamanho = assinatura[0]
+            if tamanho:
+                with mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    inicio = 0
+                    while inicio < tamanho:
+                        fim = mm.find(b'\n', inicio)
+                        if fim < 0:
+                            fim = tamanho
+                        separador = mm.find(b'|', inicio + 1, fim)
+                        reg_id = bytes(mm[inicio + 1:separador]) if separador > 0 else b''
+                        reg_id = reg_id.strip().upper()
+                        codigo = codigo_do_registro.get(reg_id)
+                        if codigo is None:
+                            codigo = codigo_do_registro[reg_id] = len(registros)
+                            registros.append(reg_id.decode('ascii', 'ignore'))
+                        posicoes.append(inicio)
+                        codigos.append(codigo)
+                        inicio = fim + 1
+                        if reg_id == b'9999':
+                            # A assinatura digital que pode seguir o registro
+                            # 9999 não faz parte das linhas do arquivo.
+                            break
+            posicoes.append(min(inicio, tamanho))
+        return cls(filename, posicoes, codigos, registros, assinatura)
+
+    @classmethod
+    def carregar(cls, filename, arquivo_do_indice=None):
+        """
+        Lê o índice gravado por salvar(). Retorna None se o arquivo auxiliar
+        não existir, for inválido ou não corresponder mais ao arquivo SPED.
+        """
+        arquivo_do_indice = arquivo_do_indice or filename + EXTENSAO
+        try:
+            assinatura = _assinatura_do_arquivo(filename)
+            with open(arquivo_do_indice, 'rb') as idx:
+                cabecalho = idx.read(_CABECALHO.size)
+                if len(cabecalho) != _CABECALHO.size:
+                    return None
+                marca, tamanho, modificacao, numero_de_linhas, tamanho_dos_registros = \
+                    _CABECALHO.unpack(cabecalho)
+                if marca != _ASSINATURA or (tamanho, modificacao) != assinatura:
+                    return None
+                registros = idx.read(tamanho_dos_registros).decode('ascii').split('|')
+                posicoes = array('Q')
+                posicoes.fromfile(idx, numero_de_linhas + 1)
+                codigos = array('H')
+                codigos.fromfile(idx, numero_de_linhas)
+        except (OSError, EOFError, UnicodeDecodeError, struct.error):
+            return None
+        if not numero_de_linhas:
+            registros = []
+        return cls(filename, posicoes, codigos, registros, assinatura)
+
+    def salvar(self, arquivo_do_indice=None):
+        arquivo_do_indice = arquivo_do_indice or self.filename + EXTENSAO
+        registros = '|'.join(self._registros).encode('ascii')
+        with open(arquivo_do_indice, 'wb') as idx:
+            idx.write(_CABECALHO.pack(_ASSINATURA, self._assinatura_do_arquivo[0],
+                                      self._assinatura_do_arquivo[1], len(self),
+                                      len(registros)))
+            idx.write(registros)
+            self._posicoes.tofile(idx)
+            self._codigos.tofile(idx)
+
+    def registros(self):
+        """Códigos de registro (REG) presentes no arquivo, na ordem em que aparecem."""
+        return list(self._registros)
+
+    def registro(self, numero_da_linha):
+        return self._registros[self._codigos[numero_da_linha - 1]]
+
+    def numeros_das_linhas(self, reg_id):
+        if self._linhas_por_registro is None:
+            linhas_por_registro = {}
+            for numero, codigo in enumerate(self._codigos, 1):
+                linhas_por_registro.setdefault(codigo, []).append(numero)
+            self._linhas_por_registro = linhas_por_registro
+        try:
+            codigo = self._registros.index(reg_id)
+        except ValueError:
+            return []
+        return list(self._linhas_por_registro.get(codigo, ()))
+
+    def numeros_das_linhas_do_bloco(self, bloco_id):
+        return [numero for numero, codigo in enumerate(self._codigos, 1)
+                if self._registros[codigo][:1] == bloco_id]
+
+    def linha(self, numero_da_linha):
+        """Linha (em bytes, sem o '\\n' final) pelo seu número, a partir de 1."""
+        return next(self.linhas([numero_da_linha]))[1]
+
+    def linhas(self, numeros_das_linhas):
+        """Gera (numero_da_linha, linha) lendo apenas as linhas solicitadas."""
+        with open(self.filename, 'rb') as arquivo:
+            for numero in numeros_das_linhas:
+                if not 1 <= numero <= len(self):
+                    raise IndexError('linha inexistente: %s' % numero)
+                inicio = self._posicoes[numero - 1]
+                arquivo.seek(inicio)
+                linha = arquivo.read(self._posicoes[numero] - inicio)
+                if linha.endswith(b'\n'):
+                    linha = linha[:-1]
+                yield numero, linha
+
+    def linhas_do_registro(self, reg_id):
+        return self.linhas(self.numeros_das_linhas(reg_id))
+
+    def linhas_do_bloco(self, bloco_id):
+        return self.linhas(self.numeros_das_linhas_do_bloco(bloco_id))
+
+    def campos(self, numeros_das_linhas, codificacao='utf-8', compacto=False):
+        """Gera (numero_da_linha, reg_id, campos) como sped.tokenizador.tokenizar."""
+        for numero, linha in self.linhas(numeros_das_linhas):
+            reg_id, campos = separar_campos(linha, codificacao, compacto)
+            yield numero, reg_id, campos
+
+
+def indexar(filename, salvar=True):
+    """
+    Retorna o índice de filename, reaproveitando o arquivo auxiliar quando
+    ele ainda corresponde ao arquivo SPED. Caso contrário o índice é
+    construído e, com salvar=True, gravado (se o diretório permitir escrita).
+    """
+    indice = IndiceDeArquivo.carregar(filename)
+    if indice is None:
+        indice = IndiceDeArquivo.construir(filename)
+        if salvar:
+            try:
+                indice.salvar()
+            except OSError:
+                pass
+    return indice
+
+
+def _assinatura_do_arquivo(arquivo):
+    estado = os.stat(arquivo)
+    return estado.st_size, estado.st_mtime_ns
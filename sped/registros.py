@@ -6,9 +6,23 @@ from .campos import CampoRegex
 from .erros import CampoError
 from .erros import CampoInexistenteError
 from .erros import RegistroError
-import itertools
+import sys
 
-class Registro(object):
+
+class _MetaRegistro(type):
+    """
+    Declara __slots__ vazio em cada subclasse de Registro que não o declare,
+    de modo que os registros não tenham __dict__ por instância.
+    """
+    def __new__(mcs, nome, bases, namespace, **kwargs):
+        namespace.setdefault('__slots__', ())
+        # Como type() faria, usar o módulo de quem criou a classe
+        # (por exemplo, as classes criadas com type() em Escrituracao).
+        namespace.setdefault('__module__', sys._getframe(1).f_globals.get('__name__'))
+        return super().__new__(mcs, nome, bases, namespace, **kwargs)
+
+
+class Registro(object, metaclass=_MetaRegistro):
     """
     Classe abstrata para a manipulação dos registros.
 
@@ -37,7 +51,10 @@ class Registro(object):
     >>> r.DT_INI = date(2014, 2, 1)
     >>> r.DT_INI
     datetime.date(2014, 2, 1)
-    >>> r.DT_INI = '01012014' # doctest: +IGNORE_EXCEPTION_DETAIL
+    >>> r.DT_INI = '01012014'
+    >>> r.DT_INI
+    datetime.date(2014, 1, 1)
+    >>> r.DT_INI = 20140101 # doctest: +IGNORE_EXCEPTION_DETAIL
     Traceback (most recent call last):
      ...
     FormatoInvalidoError: RegistroTest -> DT_INI
@@ -63,10 +80,31 @@ class Registro(object):
      ...
     FormatoInvalidoError: RegistroTest -> RETIFICADORA
     """
+    __slots__ = ('_valores', '_numero_da_linha')
+
     campos = []
-    contador_de_linhas = itertools.count(1)
 
-    def __init__(self, line=None):
+    # Mapas nome -> Campo e indice -> Campo, construídos uma única vez por classe
+    # (inclusive nas classes criadas com type() em Escrituracao) por __init_subclass__.
+    _campos_por_nome = {}
+    _campos_por_indice = {}
+    _campos_fixos = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if 'campos' not in cls.__dict__:
+            # Subclasse que apenas herda os campos (como as de cada Escrituracao):
+            # os mapas herdados continuam válidos.
+            return
+        cls._campos_por_nome = {}
+        cls._campos_por_indice = {}
+        for c in cls.campos:
+            # Em caso de repetição, prevalece o primeiro campo, como na busca linear.
+            cls._campos_por_nome.setdefault(c.nome, c)
+            cls._campos_por_indice.setdefault(c.indice, c)
+        cls._campos_fixos = tuple(c for c in cls.campos if isinstance(c, CampoFixo))
+
+    def __init__(self, line=None, numero_da_linha=None):
         if not line:
             self._valores = [''] * (len(self.campos) + 2)
             for c in self.campos:
@@ -75,17 +113,28 @@ class Registro(object):
             self._numero_da_linha = None
         else:
             #self._valores = line.split('|')
-            self._valores = [valor.strip() for valor in line.split('|')]
-            for c in self.campos:
-                if isinstance(c, CampoFixo):
-                    if self._valores[c.indice] != c.valor:
-                        raise CampoError(self, c.nome)
-            # Inicializar contador na leitura do registro de abertura '0000'
-            # if self.__class__.__name__ == 'Registro0000':
-            if self._valores[1] == '0000':
-                Registro.contador_de_linhas = itertools.count(1)
-            # Informação do número da linha do arquivo sped
-            self._numero_da_linha = next(Registro.contador_de_linhas)
+            self._ler_valores([valor.strip() for valor in line.split('|')], numero_da_linha)
+
+    @classmethod
+    def de_valores(cls, valores, numero_da_linha=None):
+        """
+        Cria o registro a partir dos valores já separados de uma linha,
+        por exemplo, os campos produzidos por sped.tokenizador.tokenizar.
+        """
+        registro = cls.__new__(cls)
+        registro._ler_valores(valores, numero_da_linha)
+        return registro
+
+    def _ler_valores(self, valores, numero_da_linha):
+        # Atribuição direta aos slots, sem passar por __setattr__ (este método
+        # é chamado para cada linha lida e para cada linha de Bloco.extend_rows).
+        _definir_valores(self, valores)
+        for c in self._campos_fixos:
+            if valores[c.indice] != c.valor:
+                raise CampoError(self, c.nome)
+        # Informação do número da linha do arquivo sped, fornecida por quem
+        # faz a leitura (ver sped.arquivos.ContextoDeLeitura).
+        _definir_numero_da_linha(self, numero_da_linha)
 
     @property
     def numero_da_linha(self):
@@ -96,19 +145,22 @@ class Registro(object):
         return self._valores
 
     def __getitem__(self, key):
-        campo = ([c for c in self.campos if c.indice == key or c.nome == key] or [None])[0]
+        campo = self._campos_por_indice.get(key) or self._campos_por_nome.get(key)
         if not campo:
             raise CampoInexistenteError(self, key)
         return campo.get(self)
 
     def __setitem__(self, key, value):
-        campo = ([c for c in self.campos if c.indice == key or c.nome == key] or [None])[0]
+        campo = self._campos_por_indice.get(key) or self._campos_por_nome.get(key)
         if not campo:
             raise CampoInexistenteError(self, key)
         campo.set(self, value)
 
     def __getattr__(self, name):
-        campo = ([c for c in self.campos if c.nome == name] or [None])[0]
+        if name.startswith('__'):
+            # Métodos especiais procurados por pickle e copy (__setstate__, __deepcopy__, ...)
+            raise AttributeError(name)
+        campo = self._campos_por_nome.get(name)
         if not campo:
             raise CampoInexistenteError(self, name)
         return campo.get(self)
@@ -117,7 +169,7 @@ class Registro(object):
         if name.startswith('_'):
             super(Registro, self).__setattr__(name, value)
             return
-        campo = ([c for c in self.campos if c.nome == name] or [None])[0]
+        campo = self._campos_por_nome.get(name)
         if not campo:
             raise CampoInexistenteError(self, name)
         campo.set(self, value)
@@ -131,6 +183,12 @@ class Registro(object):
     def __repr__(self):
         return '<%s.%s>' % (self.__class__.__module__, self.__class__.__name__)
 
+
+# Descritores dos slots de Registro (ver Registro._ler_valores).
+_definir_valores = Registro._valores.__set__
+_definir_numero_da_linha = Registro._numero_da_linha.__set__
+
+
 class RegistroIndefinido(Registro):
     def __init__(self):
         super(RegistroIndefinido, self).__init__()
@@ -24,22 +24,17 @@ license='MIT'
 import sys, os, re
 from time import time, sleep
 from sped import __version__
+from sped.cache import CacheDeLeitura
 from sped.relatorios.find_efd_files import ReadFiles, Total_Execution_Time
-from sped.relatorios.get_sped_info import SPED_EFD_Info
-from sped.relatorios.exportar_para_xlsx import Exportar_Excel
 
 import locale
 locale.setlocale(locale.LC_NUMERIC, 'pt_BR.utf8') # 'pt_BR.utf8', 'pt_BR.UTF-8'
 
-import numpy as np
-import pandas as pd
-
-import psutil
+# pandas, numpy, psutil, xlsxwriter e os módulos de registros da EFD são importados
+# nas funções que os usam, e não antes da leitura dos argumentos da linha de comando.
 from time import time, sleep
 from multiprocessing import Pool # take advantage of multiple cores
 
-num_cpus = psutil.cpu_count(logical=True)
-
 # Versão mínima exigida: python 3.6.0
 python_version = sys.version_info
 if python_version < (3,6,0):
@@ -47,15 +42,37 @@ if python_version < (3,6,0):
 	print('versão atual', "%s.%s.%s" % (python_version[0],python_version[1],python_version[2]))
 	exit()
 
-def get_sped_info(numero_do_arquivo, sped_file_path, lista_de_arquivos):
+def get_sped_info(numero_do_arquivo, sped_file_path, lista_de_arquivos, usar_cache=False):
 
 	tipo_da_efd = lista_de_arquivos.informations[sped_file_path]['tipo']
 	codificacao = lista_de_arquivos.informations[sped_file_path]['codificação']
+
+	# arquivo .csv gerado por SPED_EFD_Info ao lado do arquivo da EFD
+	arquivo_csv = os.path.splitext(sped_file_path)[0] + '.csv'
+
+	# Com a opção --cache, reaproveitar as informações e o arquivo .csv de uma execução
+	# anterior enquanto o conteúdo do arquivo não mudar (ver sped.cache).
+	if usar_cache:
+		cache = CacheDeLeitura()
+		chave = cache.chave(sped_file_path, 'efd_info_mensal', 'csv', tipo_da_efd, codificacao)
+		guardado = cache.obter(chave)
+		if guardado is not None:
+			efd_info_mensal, conteudo_csv = guardado
+			with open(arquivo_csv, 'wb') as csv_file:
+				csv_file.write(conteudo_csv)
+			print(f"arquivo[{numero_do_arquivo:2d}]: '{sped_file_path}' (cache).")
+			return efd_info_mensal
+
+	from sped.relatorios.get_sped_info import SPED_EFD_Info
 	
 	# Instantiate an object of type SPED_EFD_Info
 	sped_file = SPED_EFD_Info(sped_file_path, numero_do_arquivo, encoding=codificacao, efd_tipo=tipo_da_efd, verbose=False)
 	sped_file.obter_info_dos_itens()
 
+	if usar_cache:
+		with open(arquivo_csv, 'rb') as csv_file:
+			cache.guardar(chave, (sped_file.efd_info_mensal, csv_file.read()))
+
 	return sped_file.efd_info_mensal # lista de dicionários
 
 def make_target_name(arquivos_escolhidos):
@@ -85,6 +102,9 @@ def make_target_name(arquivos_escolhidos):
 
 def consolidacao_das_operacoes_por_cst(efd_info_mensal, efd_info_total):
 
+	import numpy as np
+	import pandas as pd
+
 	# https://pandas.pydata.org/pandas-docs/stable/reference/api/pandas.set_option.html
 	# pd.describe_option() # offline documentation
 	pd.options.display.float_format = '{:0.2f}'.format
@@ -156,6 +176,9 @@ def consolidacao_das_operacoes_por_cst(efd_info_mensal, efd_info_total):
 
 def consolidacao_das_operacoes_por_cfop(efd_info_mensal, efd_info_total):
 
+	import numpy as np
+	import pandas as pd
+
 	# https://pandas.pydata.org/pandas-docs/stable/reference/api/pandas.set_option.html
 	# pd.describe_option() # offline documentation
 	pd.options.display.float_format = '{:0.2f}'.format
@@ -230,6 +253,9 @@ def consolidacao_das_operacoes_por_cfop(efd_info_mensal, efd_info_total):
 
 def classificacao_da_receita_bruta(efd_info_mensal, efd_info_total):
 
+	import numpy as np
+	import pandas as pd
+
 	# https://pandas.pydata.org/pandas-docs/stable/reference/api/pandas.set_option.html
 	# pd.describe_option() # offline documentation
 	pd.options.display.float_format = '{:0.2f}'.format
@@ -312,6 +338,9 @@ def classificacao_da_receita_bruta(efd_info_mensal, efd_info_total):
 
 def consolidacao_das_operacoes_por_natureza(efd_info_mensal, efd_info_total):
 
+	import numpy as np
+	import pandas as pd
+
 	# https://pandas.pydata.org/pandas-docs/stable/reference/api/pandas.set_option.html
 	# pd.describe_option() # offline documentation
 	pd.options.display.float_format = '{:0.2f}'.format
@@ -740,6 +769,10 @@ def main():
 
 	# argumentos: sys.argv: argv[0], argv[1], argv[2], ...
 	command_line = sys.argv[1:]
+
+	# opção --cache: reaproveitar as informações de execuções anteriores (ver sped.cache)
+	usar_cache = '--cache' in command_line
+	command_line = [opcao for opcao in command_line if opcao != '--cache']
 	
 	if len(command_line) == 0:
 		print("\n Selecione os arquivos pelos números correspondentes.")
@@ -750,6 +783,8 @@ def main():
 		print("\tExemplo C (selecionar os arquivos de 1 a 6): \n\tefd_relatorios 1..6 \n")
 		print("\tExemplo D (selecionar os arquivos 2, 4 e 8): \n\tefd_relatorios 2 4 8 \n")
 		print("\tExemplo E (selecionar os arquivos de 1 a 5, 7, 9, 12 a 15 e 18): \n\tefd_relatorios 1..5 7 9 12..15 18 \n")
+		print("\tCom a opção --cache, as informações dos arquivos não alterados desde a execução anterior")
+		print("\tsão reaproveitadas (diretório: $SPED_CACHE ou ~/.cache/python-sped): \n\tefd_relatorios --cache 1..6 \n")
 		exit()
 	else:
 		# concatenate item in list to strings
@@ -820,8 +855,11 @@ def main():
 	# https://sebastianraschka.com/Articles/2014_multiprocessing.html
 	# https://stackoverflow.com/questions/26068819/how-to-kill-all-pool-workers-in-multiprocess
 	# https://www.programcreek.com/python/index/175/multiprocessing
+	import psutil
+	num_cpus = psutil.cpu_count(logical=True)
+
 	pool    = Pool( processes = int(max(1, num_cpus - 2)) )
-	results = [ pool.apply_async(get_sped_info, args=(k,v,lista_de_arquivos)) for (k,v) in arquivos_escolhidos.items() ]
+	results = [ pool.apply_async(get_sped_info, args=(k,v,lista_de_arquivos,usar_cache)) for (k,v) in arquivos_escolhidos.items() ]
 	output  = [ p.get() for p in results ]
 	pool.close()
 
@@ -859,6 +897,7 @@ def main():
 		print('\nConsolidação das Operações Segregadas por CFOP (EFD ICMS_IPI):')
 		consolidacao_das_operacoes_por_cfop(efd_info_mensal_efd_icmsipi, efd_info_total)
 	
+	from sped.relatorios.exportar_para_xlsx import Exportar_Excel
 	excel_file = Exportar_Excel(efd_info_total, final_file_excel, verbose=False)
 	excel_file.salvar_arquivo_no_hd
 
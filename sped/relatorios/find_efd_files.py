@@ -1,8 +1,10 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import re, os, glob, sys
-import cchardet as chardet # pip3 install cchardet
+import re, os, glob, sys, fnmatch, zipfile
+from sped.codificacao import amostrar, detectar_codificacao
+from sped.compressao import EXTENSOES, compactado, listar_membros, nome_descompactado
+from sped.tokenizador import contar_linhas
 
 Autor = 'Claudio Fernandes de Souza Rodrigues (claudiofsr@yahoo.com)'
 Data  = '06 de Fevereiro de 2020 (início: 15 de Dezembro de 2020)'
@@ -51,11 +53,14 @@ class ReadFiles:
 	
 	# https://stackoverflow.com/questions/9629179/python-counting-lines-in-a-huge-10gb-file-as-fast-as-possible
 	def count_number_of_lines(self,file_path):
+		'''
+		Número de linhas do arquivo SPED (até o registro 9999), contadas em blocos de bytes,
+		sem decodificar o texto. Se o arquivo já foi lido por completo (ArquivoDigital.readfile),
+		o número de linhas informado pela leitura é reaproveitado (ver sped.tokenizador.contar_linhas).
+		'''
 		lines = 0
 		try:
-			with open(file_path, mode='r', encoding="utf-8", errors='ignore') as filename:
-				for _ in filename: 
-					lines += 1
+			lines = contar_linhas(file_path)
 		except FileNotFoundError:
 			print('O Arquivo não existe!')
 		return f'{lines:,}'.replace(',','.')
@@ -65,35 +70,37 @@ class ReadFiles:
 	# https://github.com/PyYoshi/cChardet
 	# iconv -f WINDOWS-1252 -t UTF-8 filename.txt # iconv - convert text from one character encoding to another
 	def predict_encoding(self,file_path):
-		'''Predict a file's encoding using cchardet'''
-		# import cchardet as chardet
-		lines = []
-		my_regex = rb"^\|9999\|\d+\|"  # descartar informações após a linha que contém |9999| seguido por dígitos ; b'': binary mode
-		with open(file_path, mode='rb') as filename: # mode 'rb': open the file as binary data
-			for line in filename:
-				match_object = re.search(my_regex, line, flags=re.IGNORECASE)
-				if len(lines) > 2**8 or match_object:
-					#print(f'{file_path = } ; {line = }')
-					break
-				lines.append(line)
-		rawdata = b''.join(lines)
-		info = chardet.detect(rawdata) # {'encoding': 'UTF-8', 'confidence': 0.9900000095367432}
-		encoding = info['encoding']
-		if encoding is None or not re.search('UTF-8', encoding, flags=re.IGNORECASE):
-			encoding = 'Latin-1'
-		return encoding
+		'''
+		Predict a file's encoding: 'UTF-8' or 'Latin-1'.
+		A detecção é feita uma única vez por arquivo (enquanto ele não for alterado) por
+		sped.codificacao, com uma amostra limitada de bytes, e é a mesma usada por readfile.
+		'''
+		return detectar_codificacao(file_path)
 	
 	@property
 	def find_all_files(self):
 		# https://www.mkyong.com/python/python-how-to-list-all-files-in-a-directory/
 		# https://docs.python.org/3/library/glob.html
 		files = [f for f in glob.glob(self.root_path + '/' + f"**/*.{self.extension}", recursive = self.recursive)]
+		# Arquivos compactados (.zip, .gz, .xz) são lidos sem descompactação em disco:
+		# os arquivos com a extensão procurada dentro deles também são encontrados.
+		compressed_files = []
+		for compressed_extension in EXTENSOES:
+			compressed_files += glob.glob(self.root_path + '/' + f"**/*{compressed_extension}", recursive = self.recursive)
+		for compressed_file in compressed_files:
+			if not os.path.isfile(compressed_file) or compressed_file in files:
+				continue
+			try:
+				members = listar_membros(compressed_file)
+			except (OSError, zipfile.BadZipFile):
+				continue
+			files += [m for m in members if fnmatch.fnmatch(nome_descompactado(m).casefold(), f"*.{self.extension}".casefold())]
 		# How to use a variable inside a regular expression?
 		my_regex = f"{self.pattern}" # Literal String Interpolation, "f-strings".
 		for file_path in files:
 			# path.isfile: The easiest way to check if both a file exists and if it is a file.
 			# seen_file:   Is there a more Pythonic way to prevent adding a duplicate to a list?
-			if not os.path.isfile(file_path) or file_path.casefold() in self.seen_file:
+			if not (os.path.isfile(file_path) or compactado(file_path)) or file_path.casefold() in self.seen_file:
 				continue
 			match_pattern = re.search(my_regex, str(file_path), flags=re.IGNORECASE)
 			if match_pattern:
@@ -122,35 +129,29 @@ class ReadFiles:
 		idx_data = [6,4]
 		idx_cnpj = [9,7]
 		for file_path in self.informations:
-			encode_info = None
 			if not re.search(regex_efd[indice], file_path, flags=re.IGNORECASE):
 				continue
-			# Ler apenas a primeira linha para obter encode_info
-			with open(file_path, mode='rb') as filename: # mode 'rb': open the file as binary data
-				for line in filename:
-					info = chardet.detect(line) # {'encoding': 'UTF-8', 'confidence': 0.9900000095367432}
-					encode_info = info['encoding']
-					#print(f'{file_path = } ; {encode_info = } ; {info = }')
-					break
-			# Ler apenas a primeira linha para obter informações do registro de abertura '0000'.
-			with open(file_path, mode='r', encoding=encode_info, errors='ignore') as filename: # encoding='latin-1','UTF-8'
-				for line in filename:
-					campos = line.strip().split('|')
-					if len(campos) <= 10:
-						break
-					campo_registro = campos[1] # A primeira linha deve conter o registro '0000'
-					campo_nome = campos[ idx_nome[indice] ]
-					campo_data = campos[ idx_data[indice] ]
-					campo_cnpj = campos[ idx_cnpj[indice] ] # o campo CNPJ deve conter 14 dígitos
-					match_regi = re.search(  '0000', campo_registro)
-					match_cnpj = re.search(r'(\D|^)\d{14}(\D|$)', campo_cnpj)
-					match_data = re.search(r'(\D|^)\d{8}(\D|$)', campo_data)
-					if match_regi and match_cnpj and match_data:
-						self.informations[file_path]['tipo'] = efd_type[indice]
-						self.informations[file_path]['NOME'] = campo_nome
-						self.informations[file_path]['CNPJ'] = "%s.%s.%s/%s-%s" % (campo_cnpj[0:2],campo_cnpj[2:5],campo_cnpj[5:8],campo_cnpj[8:12],campo_cnpj[12:14])
-						self.informations[file_path]['DT_INI'] = "%s/%s/%s" % (campo_data[0:2],campo_data[2:4],campo_data[4:8])
-					break
+			# Uma única leitura (amostra) do início do arquivo fornece a codificação e a
+			# primeira linha, com as informações do registro de abertura '0000'.
+			amostra = amostrar(file_path)
+			encode_info = amostra.codificacao
+			self.informations[file_path]['codificação'] = encode_info
+			line = amostra.primeira_linha.decode(encode_info, errors='ignore')
+			campos = line.strip().split('|')
+			if len(campos) <= 10:
+				continue
+			campo_registro = campos[1] # A primeira linha deve conter o registro '0000'
+			campo_nome = campos[ idx_nome[indice] ]
+			campo_data = campos[ idx_data[indice] ]
+			campo_cnpj = campos[ idx_cnpj[indice] ] # o campo CNPJ deve conter 14 dígitos
+			match_regi = re.search(  '0000', campo_registro)
+			match_cnpj = re.search(r'(\D|^)\d{14}(\D|$)', campo_cnpj)
+			match_data = re.search(r'(\D|^)\d{8}(\D|$)', campo_data)
+			if match_regi and match_cnpj and match_data:
+				self.informations[file_path]['tipo'] = efd_type[indice]
+				self.informations[file_path]['NOME'] = campo_nome
+				self.informations[file_path]['CNPJ'] = "%s.%s.%s/%s-%s" % (campo_cnpj[0:2],campo_cnpj[2:5],campo_cnpj[5:8],campo_cnpj[8:12],campo_cnpj[12:14])
+				self.informations[file_path]['DT_INI'] = "%s/%s/%s" % (campo_data[0:2],campo_data[2:4],campo_data[4:8])
 		# Filter a Dictionary by values in Python using dict comprehension
 		return {key: value for (key, value) in sorted(self.informations.items()) if value['tipo'] == efd_type[indice]}
 		
@@ -8,8 +8,6 @@ license='MIT'
 
 import os, re, sys, itertools, csv
 from time import time, sleep
-from sped.efd.pis_cofins.arquivos import ArquivoDigital as ArquivoDigital_PIS_COFINS
-from sped.efd.icms_ipi.arquivos   import ArquivoDigital as ArquivoDigital_ICMS_IPI
 from sped.relatorios.efd_tabelas  import EFD_Tabelas
 from sped.relatorios.switcher import My_Switch
 
@@ -30,8 +28,8 @@ class SPED_EFD_Info:
 	
 	# class or static variable
 	
-	# Python 3 Deep Dive (Part 4 - OOP)/03. Project 1/03. Project Solution - Transaction Numbers
-	contador_de_linhas = itertools.count(1) # 1 é o valor inicial do contador
+	# Blocos utilizados: 0 (cadastros) e A a K (ver info_dos_blocos). Os demais não são lidos.
+	blocos_lidos = {'0', 'A', 'B', 'C', 'D', 'E', 'F', 'G', 'H', 'I', 'J', 'K'}
 	
 	### --- registros e colunas --- ###
 	
@@ -97,6 +95,10 @@ class SPED_EFD_Info:
 		registros_de_codigo_cst + registros_de_chave_eletronica + registros_de_valor_do_item + 
 		colunas_selecionadas + colunas_de_rateio + colunas_adicionais)
 
+	# Campos separados e guardados na leitura dos registros (ver ArquivoDigital.readfile):
+	# registros_totais e o 'CPF' do participante (Registro 0150). Os demais ficam vazios.
+	campos_lidos = registros_totais | {'CPF'}
+
 	# https://www.geeksforgeeks.org/classmethod-in-python/
 	# https://realpython.com/instance-class-and-static-methods-demystified/
 	@staticmethod
@@ -153,9 +155,12 @@ class SPED_EFD_Info:
 			self.encoding = encoding
 
 		if efd_tipo is None or re.search(r'PIS|COFINS|Contrib', efd_tipo, flags=re.IGNORECASE):
+			# Importar apenas os registros do tipo de EFD lido.
+			from sped.efd.pis_cofins.arquivos import ArquivoDigital as ArquivoDigital_PIS_COFINS
 			self.objeto_sped = ArquivoDigital_PIS_COFINS() # instanciar objeto sped_efd
 			self.efd_tipo = 'EFD Contribuições'
 		elif re.search(r'ICMS|IPI', efd_tipo, flags=re.IGNORECASE):
+			from sped.efd.icms_ipi.arquivos import ArquivoDigital as ArquivoDigital_ICMS_IPI
 			self.objeto_sped = ArquivoDigital_ICMS_IPI()   # instanciar objeto sped_efd
 			self.efd_tipo = 'EFD ICMS_IPI'
 		else:
@@ -171,6 +176,11 @@ class SPED_EFD_Info:
 		self.myDict = {}
 
 		self.efd_info_mensal = []
+
+		# Python 3 Deep Dive (Part 4 - OOP)/03. Project 1/03. Project Solution - Transaction Numbers
+		# Contador próprio de cada arquivo, para que a leitura simultânea de vários
+		# arquivos no mesmo processo não misture a numeração.
+		self.contador_de_linhas = itertools.count(1) # 1 é o valor inicial do contador
 	
 	def obter_info_dos_itens(self):
 
@@ -178,7 +188,7 @@ class SPED_EFD_Info:
 		select_object.formatar_valores_entrada()
 		self.myDict = select_object.dicionario
 						
-		self.objeto_sped.readfile(self.file_path, codificacao=self.encoding, verbose=self.verbose)
+		self.objeto_sped.readfile(self.file_path, codificacao=self.encoding, verbose=self.verbose, blocos=type(self).blocos_lidos, campos=type(self).campos_lidos, internar=True)
 
 		self.codigo_da_natureza = type(self).natureza_da_bc_dos_creditos()
 
@@ -462,7 +472,7 @@ class SPED_EFD_Info:
 		"""
 
 		dict_info['Arquivo da SPED EFD'] = self.basename
-		dict_info['Linhas'] = next(type(self).contador_de_linhas)
+		dict_info['Linhas'] = next(self.contador_de_linhas)
 		dict_info['EFD Tipo'] = self.efd_tipo # 'EFD Contribuições' ou 'EFD ICMS_IPI'
 
 		# adicionar informação de 'Tipo de Operação'
@@ -10,6 +10,7 @@ import sys, re
 from time import time, sleep
 from decimal import Decimal
 from datetime import datetime # https://strftime.org/
+from functools import lru_cache
 from sped.relatorios.efd_tabelas import EFD_Tabelas
 from sped.campos import (CampoData, CampoCNPJ, CampoCPF, CampoNCM,
                         CampoCPFouCNPJ, CampoChaveEletronica)
@@ -138,6 +139,7 @@ class My_Switch:
 			return float(valor)
 	
 	@staticmethod
+	@lru_cache(maxsize=4096) # poucas datas distintas se repetem em milhares de linhas
 	def formatar_datas(data):
 		date_time = datetime.strptime(data, "%d/%m/%Y") # dd/mm/aaaa
 		return date_time
@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+
+import re
+from array import array
+from itertools import accumulate
+from itertools import chain
+
+from .compressao import abrir_binario
+from .compressao import assinatura as assinatura_do_arquivo
+
+# Quantidade de bytes lidos do disco a cada chamada de read().
+TAMANHO_DO_BUFFER = 2 ** 20
+
+_espacos = re.compile(r'\s{2,}')
+
+# Início da linha do registro de encerramento do arquivo.
+_ENCERRAMENTO = b'\n|9999|'
+
+# Número de linhas já conhecido de cada arquivo, por (tamanho, data de modificação).
+_numeros_de_linhas = {}
+
+
+def ler_linhas(arquivo, tamanho_do_buffer=TAMANHO_DO_BUFFER, limite=None):
+    """
+    Gera as linhas (em bytes, ainda com o '\\r' final) de um arquivo binário,
+    lendo o arquivo em blocos grandes. Com limite, lê no máximo limite bytes
+    a partir da posição atual do arquivo.
+
+    >>> from io import BytesIO
+    >>> list(ler_linhas(BytesIO(b'|0000|a|\\r\\n|9999|2|'), tamanho_do_buffer=4))
+    [b'|0000|a|\\r', b'|9999|2|']
+    >>> list(ler_linhas(BytesIO(b'|0000|a|\\r\\n|9999|2|'), limite=10))
+    [b'|0000|a|\\r']
+    """
+    resto = b''
+    while limite is None or limite > 0:
+        bloco = arquivo.read(tamanho_do_buffer if limite is None else min(tamanho_do_buffer, limite))
+        if not bloco:
+            break
+        if limite is not None:
+            limite -= len(bloco)
+        linhas = (resto + bloco).split(b'\n')
+        resto = linhas.pop()
+        yield from linhas
+    if resto:
+        yield resto
+
+
+def contar_linhas(filename, tamanho_do_buffer=TAMANHO_DO_BUFFER):
+    """
+    Número de linhas do arquivo SPED até o registro de encerramento (9999),
+    inclusive: o mesmo número de linhas do registro 9999. Sem o registro 9999,
+    todas as linhas são contadas.
+
+    O arquivo é lido em bytes, em blocos grandes, e os '\\n' de cada bloco
+    são contados sem decodificar o texto. O resultado é guardado enquanto o
+    arquivo não for alterado; a leitura completa de um arquivo por
+    ArquivoDigital também informa o seu número de linhas (ver
+    registrar_numero_de_linhas), de modo que o arquivo não precisa ser
+    percorrido de novo.
+
+    >>> import os, tempfile
+    >>> with tempfile.NamedTemporaryFile('wb', delete=False) as f:
+    ...     _ = f.write(b'|0000|a|\\r\\n|0001|1|\\r\\n|9999|3|\\r\\nASSINATURA\\r\\n...')
+    >>> contar_linhas(f.name)
+    3
+    >>> _numeros_de_linhas.clear()
+    >>> contar_linhas(f.name, tamanho_do_buffer=16)
+    3
+    >>> with open(f.name, 'wb') as arquivo:
+    ...     _ = arquivo.write(b'|0000|a|\\r\\n|0001|1|')
+    >>> contar_linhas(f.name)
+    2
+    >>> os.remove(f.name)
+    """
+    caminho, assinatura = assinatura_do_arquivo(filename)
+    conhecido = _numeros_de_linhas.get(caminho)
+    if conhecido is not None and conhecido[0] == assinatura:
+        return conhecido[1]
+    linhas = 0
+    anterior = b'\n'
+    bloco = b''
+    with abrir_binario(filename) as arquivo:
+        while True:
+            proximo = arquivo.read(tamanho_do_buffer)
+            if not proximo:
+                break
+            linhas += proximo.count(b'\n')
+            if bloco:
+                anterior = bloco
+            bloco = proximo
+    # O registro 9999 e a assinatura digital que pode segui-lo ficam no fim do
+    # arquivo: basta procurá-lo nos dois últimos blocos lidos.
+    final = anterior + bloco
+    posicao = final.rfind(_ENCERRAMENTO)
+    if posicao >= 0:
+        linhas -= final.count(b'\n', posicao + 1)
+        linhas += 1 # a própria linha do registro 9999
+    elif bloco and not bloco.endswith(b'\n'):
+        linhas += 1 # última linha sem '\n'
+    _numeros_de_linhas[caminho] = (assinatura, linhas)
+    return linhas
+
+
+def registrar_numero_de_linhas(filename, numero_de_linhas):
+    """Guarda o número de linhas de filename, obtido por uma leitura completa."""
+    caminho, assinatura = assinatura_do_arquivo(filename)
+    _numeros_de_linhas[caminho] = (assinatura, numero_de_linhas)
+
+
+class CamposBrutos(object):
+    """
+    Campos de uma linha do SPED separados uma única vez, ainda em bytes.
+
+    Cada campo só é decodificado e normalizado (espaços repetidos e espaços
+    nas extremidades) quando é acessado pela primeira vez.
+
+    >>> campos = CamposBrutos(b'|C100|0|  texto   com  espacos |\\r'.split(b'|'), 'utf-8')
+    >>> len(campos)
+    5
+    >>> campos[3]
+    'texto com espacos'
+    >>> campos[-1]
+    ''
+    >>> list(campos)
+    ['', 'C100', '0', 'texto com espacos', '']
+    """
+    __slots__ = ('_campos', '_codificacao')
+
+    def __init__(self, campos, codificacao):
+        self._campos = campos
+        self._codificacao = codificacao
+
+    def __len__(self):
+        return len(self._campos)
+
+    def __getitem__(self, indice):
+        if isinstance(indice, slice):
+            return [self[i] for i in range(*indice.indices(len(self._campos)))]
+        valor = self._campos[indice]
+        if valor.__class__ is bytes:
+            valor = _espacos.sub(' ', valor.decode(self._codificacao, 'ignore')).strip()
+            self._campos[indice] = valor
+        return valor
+
+    def __setitem__(self, indice, valor):
+        self._campos[indice] = valor
+
+    def __reduce__(self):
+        return self.__class__, (self._campos, self._codificacao)
+
+    def __iter__(self):
+        for indice in range(len(self._campos)):
+            yield self[indice]
+
+    def __repr__(self):
+        return '<%s.%s(%s)>' % (self.__class__.__module__,
+                                self.__class__.__name__, self[1])
+
+
+class ValoresCompactos(object):
+    """
+    Representação compacta dos campos de uma linha do SPED: a linha original
+    em bytes e um array('I') com a posição inicial de cada campo.
+
+    Nenhum campo fica guardado como str; cada acesso decodifica e normaliza
+    o trecho correspondente da linha. A alteração de um campo reconstrói a linha.
+
+    >>> valores = ValoresCompactos(b'|C170|1|  ITEM  01 |10,00|\\r'.split(b'|'), 'utf-8')
+    >>> len(valores)
+    6
+    >>> valores[1], valores[3], valores[-2]
+    ('C170', 'ITEM 01', '10,00')
+    >>> valores[4] = '20,00'
+    >>> '|'.join(valores)
+    '|C170|1|ITEM 01|20,00|'
+    """
+    __slots__ = ('_linha', '_posicoes', '_codificacao')
+
+    def __init__(self, campos, codificacao):
+        self._codificacao = codificacao
+        self._definir_campos(campos)
+
+    def _definir_campos(self, campos):
+        self._linha = b'|'.join(campos)
+        # posicoes[i] é o início do campo i; o último elemento marca o fim da linha.
+        self._posicoes = array('I', accumulate(chain((0,), map(len, campos)),
+                                               lambda inicio, tamanho: inicio + tamanho + 1))
+
+    def __reduce__(self):
+        return _valores_compactos, (self._linha, self._posicoes, self._codificacao)
+
+    def __len__(self):
+        return len(self._posicoes) - 1
+
+    def _campo(self, indice):
+        return self._linha[self._posicoes[indice]:self._posicoes[indice + 1] - 1]
+
+    def __getitem__(self, indice):
+        if isinstance(indice, slice):
+            return [self[i] for i in range(*indice.indices(len(self)))]
+        if indice < 0:
+            indice += len(self)
+        if not 0 <= indice < len(self):
+            raise IndexError('índice fora do intervalo: %s' % indice)
+        return _espacos.sub(' ', self._campo(indice).decode(self._codificacao, 'ignore')).strip()
+
+    def __setitem__(self, indice, valor):
+        campos = [self._campo(i) for i in range(len(self))]
+        campos[indice] = str(valor).encode(self._codificacao)
+        self._definir_campos(campos)
+
+    def __iter__(self):
+        for indice in range(len(self)):
+            yield self[indice]
+
+    def __repr__(self):
+        return '<%s.%s(%s)>' % (self.__class__.__module__,
+                                self.__class__.__name__, self[1])
+
+
+def _valores_compactos(linha, posicoes, codificacao):
+    # Usado por ValoresCompactos.__reduce__ (pickle entre processos).
+    valores = ValoresCompactos.__new__(ValoresCompactos)
+    valores._linha = linha
+    valores._posicoes = posicoes
+    valores._codificacao = codificacao
+    return valores
+
+
+def tokenizar(arquivo, codificacao='utf-8', tamanho_do_buffer=TAMANHO_DO_BUFFER,
+              compacto=False, limite=None, filtro=None, projecao=None):
+    """
+    Gera (reg_id, campos) para cada linha de um arquivo SPED aberto em modo binário.
+
+    Cada linha é separada em campos apenas uma vez. Somente o código do
+    registro é decodificado aqui (e corrigido para maiúsculo: 'c491' --> 'C491');
+    os demais campos são decodificados sob demanda por CamposBrutos ou, com
+    compacto=True, por ValoresCompactos.
+
+    Com filtro, as linhas (ainda em bytes) para as quais filtro(linha) é falso
+    não são separadas em campos: em seu lugar é gerado (None, None), de modo
+    que a contagem das linhas do arquivo é preservada.
+
+    Com projecao (ver sped.arquivos.ProjecaoDeCampos), somente os campos
+    selecionados de cada registro são guardados.
+
+    >>> from io import BytesIO
+    >>> arquivo = BytesIO('|0000|EMPRESA LTDA|\\r\\n|c491|ação|\\r\\n'.encode('utf-8'))
+    >>> [(reg_id, list(campos)) for reg_id, campos in tokenizar(arquivo)]
+    [('0000', ['', '0000', 'EMPRESA LTDA', '']), ('C491', ['', 'C491', 'ação', ''])]
+    >>> _ = arquivo.seek(0)
+    >>> [list(campos) for reg_id, campos in tokenizar(arquivo, compacto=True)]
+    [['', '0000', 'EMPRESA LTDA', ''], ['', 'C491', 'ação', '']]
+    >>> _ = arquivo.seek(0)
+    >>> [reg_id for reg_id, campos in tokenizar(arquivo, filtro=lambda linha: b'0000' in linha)]
+    ['0000', None]
+    """
+    for linha in ler_linhas(arquivo, tamanho_do_buffer, limite):
+        if filtro is not None and not filtro(linha):
+            yield None, None
+            continue
+        yield separar_campos(linha, codificacao, compacto, projecao)
+
+
+def separar_campos(linha, codificacao='utf-8', compacto=False, projecao=None):
+    """
+    Separa uma linha do SPED (em bytes) em (reg_id, campos).
+
+    >>> reg_id, campos = separar_campos(b'|c100|0|1|\\r')
+    >>> reg_id, list(campos)
+    ('C100', ['', 'C100', '0', '1', ''])
+    """
+    campos = linha.split(b'|')
+    reg_id = campos[1].decode('ascii', 'ignore').strip().upper()
+    if projecao is not None:
+        campos = projecao(reg_id, campos)
+    if compacto:
+        campos[1] = reg_id.encode('ascii')
+        return reg_id, ValoresCompactos(campos, codificacao)
+    campos[1] = reg_id
+    return reg_id, CamposBrutos(campos, codificacao)
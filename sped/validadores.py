@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+
+"""
+Validação dos dígitos verificadores de CNPJ, CPF e chaves eletrônicas
+(NF-e, CT-e, ...), com memorização dos resultados e validação em lote.
+
+Os mesmos CNPJs de participantes e chaves de documentos se repetem milhares
+de vezes nos arquivos de um ano. Por isso cada Validador guarda o resultado
+de cada valor já verificado, e validar_lote calcula apenas os valores
+distintos ainda não verificados, de forma vetorizada com NumPy (matriz de
+dígitos x pesos), quando disponível.
+
+>>> CNPJ.validar('53.939.351/0001-29'), CNPJ.validar('53939351000128')
+(True, False)
+>>> CPF.validar('333.333.333-33'), CPF.validar('12345678900')
+(True, False)
+>>> CNPJ.validar_lote(['53939351000129', '', '53939351000129', '123'])
+[True, False, True, False]
+>>> CHAVE_ELETRONICA.validar('3519 0553 9393 5100 0129 5500 1000 0000 0110 0000 0015')
+True
+"""
+
+import re
+from operator import mul
+
+_nao_digitos = re.compile(r'[^0-9]')
+_somente_digitos = re.compile(r'[0-9]*\Z')
+
+# Quantidade mínima de valores distintos para o cálculo vetorizado (NumPy).
+MINIMO_PARA_NUMPY = 64
+
+# Acima desta quantidade de valores memorizados, a memória é esvaziada.
+TAMANHO_MAXIMO_DA_MEMORIA = 2 ** 18
+
+_PESOS_CNPJ = (6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2)
+_PESOS_CPF = (11, 10, 9, 8, 7, 6, 5, 4, 3, 2)
+# Fonte: 'NFe Manual_de_Orientacao_Contribuinte_v_6.00.pdf', pg 144.
+# 5.4 Cálculo do Dígito Verificador da Chave de Acesso da NF-e
+_PESOS_CHAVE = (4, 3, 2) + (9, 8, 7, 6, 5, 4, 3, 2) * 5 + (0,)
+
+
+def _digito(soma):
+    digito = 11 - soma % 11
+    return 0 if digito >= 10 else digito
+
+
+def _soma(digitos, pesos):
+    return sum(map(mul, digitos, pesos))
+
+
+def _cnpj(digitos):
+    return (digitos[12] == _digito(_soma(digitos, _PESOS_CNPJ[1:]))
+            and digitos[13] == _digito(_soma(digitos, _PESOS_CNPJ)))
+
+
+def _cpf(digitos):
+    return (digitos[9] == _digito(_soma(digitos, _PESOS_CPF[1:]))
+            and digitos[10] == _digito(_soma(digitos, _PESOS_CPF)))
+
+
+def _chave(digitos):
+    # dentro da chave eletrônica há o CNPJ do emitente, que também é verificado
+    return digitos[43] == _digito(_soma(digitos, _PESOS_CHAVE)) and _cnpj(digitos[6:20])
+
+
+def _digitos_np(np, soma):
+    digito = 11 - soma % 11
+    digito[digito >= 10] = 0
+    return digito
+
+
+def _cnpj_np(np, matriz):
+    pesos = np.array(_PESOS_CNPJ)
+    return ((matriz[:, 12] == _digitos_np(np, matriz[:, :12] @ pesos[1:]))
+            & (matriz[:, 13] == _digitos_np(np, matriz[:, :13] @ pesos)))
+
+
+def _cpf_np(np, matriz):
+    pesos = np.array(_PESOS_CPF)
+    return ((matriz[:, 9] == _digitos_np(np, matriz[:, :9] @ pesos[1:]))
+            & (matriz[:, 10] == _digitos_np(np, matriz[:, :10] @ pesos)))
+
+
+def _chave_np(np, matriz):
+    return ((matriz[:, 43] == _digitos_np(np, matriz @ np.array(_PESOS_CHAVE)))
+            & _cnpj_np(np, matriz[:, 6:20]))
+
+
+class Validador(object):
+    """
+    Valida valores de tamanho fixo (em dígitos) e memoriza os resultados.
+    Caracteres que não são dígitos ('.', '/', '-', ' ') são ignorados.
+    """
+
+    def __init__(self, nome, tamanho, verificar, verificar_matriz):
+        self.nome = nome
+        self.tamanho = tamanho
+        self._verificar = verificar
+        self._verificar_matriz = verificar_matriz
+        self._memoria = {}
+
+    def __repr__(self):
+        return '<%s.%s(%s)>' % (self.__class__.__module__, self.__class__.__name__, self.nome)
+
+    def digitos(self, valor):
+        """Somente os dígitos de valor, ou None se não tiver o tamanho esperado."""
+        if not isinstance(valor, str):
+            valor = str(valor)
+        if not _somente_digitos.match(valor):
+            valor = _nao_digitos.sub('', valor)
+        return valor if len(valor) == self.tamanho else None
+
+    def validar(self, valor):
+        resultado = self._memoria.get(valor)
+        if resultado is None:
+            digitos = self.digitos(valor)
+            resultado = digitos is not None and self._verificar(tuple(map(int, digitos)))
+            self._memorizar(valor, resultado)
+        return resultado
+
+    def validar_lote(self, valores, formato='lista'):
+        """
+        Valida uma sequência de valores. Retorna uma lista de bool ou, com
+        formato='numpy', um array de bool.
+        """
+        valores = list(valores)
+        memoria = self._memoria
+        novos = [valor for valor in dict.fromkeys(valores) if valor not in memoria]
+        if novos:
+            self._validar_novos(novos)
+            memoria = self._memoria
+        resultado = [memoria[valor] if valor in memoria else self.validar(valor)
+                     for valor in valores]
+        if formato == 'numpy':
+            import numpy as np
+            return np.array(resultado, dtype=bool)
+        return resultado
+
+    def _validar_novos(self, novos):
+        np = None
+        if len(novos) >= MINIMO_PARA_NUMPY:
+            try:
+                import numpy as np
+            except ImportError:
+                pass
+        if np is None:
+            for valor in novos:
+                self.validar(valor)
+            return
+        digitos = [self.digitos(valor) for valor in novos]
+        completos = [d for d in digitos if d is not None]
+        resultados = iter(())
+        if completos:
+            matriz = np.frombuffer(''.join(completos).encode('ascii'), dtype=np.uint8)
+            matriz = matriz.reshape(len(completos), self.tamanho).astype(np.int64) - ord('0')
+            resultados = iter(self._verificar_matriz(np, matriz).tolist())
+        for valor, d in zip(novos, digitos):
+            self._memorizar(valor, d is not None and next(resultados))
+
+    def _memorizar(self, valor, resultado):
+        if len(self._memoria) >= TAMANHO_MAXIMO_DA_MEMORIA:
+            self._memoria = {}
+        self._memoria[valor] = resultado
+
+
+CNPJ = Validador('CNPJ', 14, _cnpj, _cnpj_np)
+CPF = Validador('CPF', 11, _cpf, _cpf_np)
+CHAVE_ELETRONICA = Validador('CHAVE_ELETRONICA', 44, _chave, _chave_np)
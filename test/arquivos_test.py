@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+import os
+import sys
+import tempfile
+
+# Necessário para que o arquivo de testes encontre
+test_root = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(test_root))
+
+from sped import arquivos
+from sped.arquivos import ContextoDeLeitura
+from sped.cache import CacheDeLeitura
+from sped.efd.pis_cofins.arquivos import ArquivoDigital
+from sped.indice import indexar
+from sped.tokenizador import _numeros_de_linhas
+from sped.tokenizador import contar_linhas
+
+ABERTURA = '|0000|006|0|||01012019|31012019|EMPRESA TESTE|11111111000191|SP|3550308||00|0|'
+
+LINHAS = [ABERTURA, '|0001|0|', '|0990|3|', '|9001|0|', '|9990|2|', '|9999|6|']
+
+# Assinatura digital (binária, com quebras de linha) após o registro 9999.
+ASSINATURA = b'SBRCAAEPDR\x00\xff\r\n|0150|\x01\n\xfe\x80'
+
+
+def gravar_arquivo(linhas):
+    with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as arquivo:
+        arquivo.write('\r\n'.join(linhas) + '\r\n')
+    return arquivo.name
+
+
+def linhas_lidas(arquivo):
+    return [(r.REG, r.numero_da_linha, r.as_line())
+            for b in arquivo._blocos.values() for r in b._registros]
+
+
+class TestArquivoDigital(unittest.TestCase):
+
+    def setUp(self):
+        self.filename = gravar_arquivo(LINHAS)
+        self.arquivo = ArquivoDigital()
+        self.arquivo.readfile(self.filename)
+
+    def tearDown(self):
+        os.remove(self.filename)
+
+    def test_iter_registros(self):
+        registros = ArquivoDigital().iter_registros(self.filename)
+        self.assertEqual(next(registros).__class__.__name__, 'Registro0000')
+        self.assertEqual([r.REG for r in registros], ['0001', '0990', '9001', '9990', '9999'])
+
+    def test_numeracao_independente_por_leitura(self):
+        a = self.arquivo.iter_registros(self.filename)
+        b = ArquivoDigital().iter_registros(self.filename)
+        self.assertEqual([(next(a).numero_da_linha, next(b).numero_da_linha) for _ in range(3)],
+                         [(1, 1), (2, 2), (3, 3)])
+
+    def test_readfile(self):
+        self.assertTrue(self.arquivo.leitura_completa)
+        self.assertEqual(self.arquivo._registro_abertura.NOME, 'EMPRESA TESTE')
+        self.assertEqual(_numeros_de_linhas[os.path.abspath(self.filename)][1], 6)
+        self.assertEqual(contar_linhas(self.filename), 6)
+
+    def test_modos_de_leitura(self):
+        for opcoes in ({'rapido': True}, {'compacto': True}, {'codificacao': 'auto'},
+                       {'processos': 2}):
+            arquivo = ArquivoDigital()
+            arquivo.readfile(self.filename, **opcoes)
+            self.assertEqual(linhas_lidas(arquivo), linhas_lidas(self.arquivo), opcoes)
+            self.assertEqual(str(arquivo._registro_abertura), str(self.arquivo._registro_abertura))
+            self.assertEqual(arquivo._blocos['9'].registro_abertura.numero_da_linha, 4)
+            self.assertEqual(arquivo._registro_encerramento.numero_da_linha, 6)
+
+    def test_blocos(self):
+        seletivo = ArquivoDigital()
+        seletivo.readfile(self.filename, blocos={'9'})
+        self.assertTrue(seletivo.leitura_completa)
+        self.assertEqual(seletivo.contexto.linhas_descartadas, 2)
+        self.assertEqual(seletivo._blocos['9'].registro_abertura.numero_da_linha, 4)
+
+    def test_registros_e_predicado(self):
+        contexto = ContextoDeLeitura()
+        lidos = [(r.REG, r.numero_da_linha) for r in self.arquivo.iter_registros(
+            self.filename, registros={'0001', '9001'},
+            predicado=lambda valores: valores[2] == '0', contexto=contexto)]
+        self.assertEqual(lidos, [('0000', 1), ('0001', 2), ('9001', 4), ('9999', 6)])
+        self.assertEqual(contexto.linhas_descartadas, 2)
+
+    def test_campos(self):
+        projetado = next(self.arquivo.iter_registros(self.filename, campos={'NOME'}))
+        self.assertEqual((projetado.NOME, projetado.CNPJ), ('EMPRESA TESTE', None))
+
+    def test_ler_colunas(self):
+        colunas = self.arquivo.ler_colunas(self.filename)
+        self.assertEqual(list(colunas), ['0000', '0001', '0990', '9001', '9990', '9999'])
+        self.assertEqual(colunas['0000'].colunas['NOME'], ['EMPRESA TESTE'])
+        self.assertEqual(colunas['9001'].numeros_das_linhas, [4])
+
+    def test_ler_colunas_com_cache(self):
+        cache = CacheDeLeitura(tempfile.mkdtemp())
+        try:
+            self.arquivo.ler_colunas(self.filename, blocos={'9'}, cache=cache)
+            colunas = self.arquivo.ler_colunas(self.filename, blocos={'9'}, cache=cache)
+            self.assertEqual(list(colunas), ['0000', '9001', '9990', '9999'])
+            self.assertEqual(len(cache), 1)
+        finally:
+            cache.limpar()
+            os.rmdir(cache.diretorio)
+
+    def test_iter_registros_indexados(self):
+        indice = indexar(self.filename, salvar=False)
+        lidos = [(r.REG, r.numero_da_linha)
+                 for r in self.arquivo.iter_registros_indexados(indice, bloco_id='9')]
+        self.assertEqual(lidos, [('9001', 4), ('9990', 5), ('9999', 6)])
+
+
+class TestArquivoInvalido(unittest.TestCase):
+
+    def tearDown(self):
+        os.remove(self.filename)
+
+    def test_registro_desconhecido(self):
+        self.filename = gravar_arquivo(LINHAS[:2] + ['|ZZZZ|1|'] + LINHAS[2:])
+        with self.assertRaises(RuntimeError):
+            ArquivoDigital().readfile(self.filename)
+        with self.assertRaises(RuntimeError):
+            list(ArquivoDigital().iter_registros(self.filename))
+
+    def test_sem_registro_de_encerramento(self):
+        self.filename = gravar_arquivo(LINHAS[:3])
+        with self.assertRaises(RuntimeError):
+            ArquivoDigital().readfile(self.filename)
+        with self.assertRaises(RuntimeError):
+            ArquivoDigital().ler_colunas(self.filename)
+        arquivo = ArquivoDigital()
+        self.assertEqual([r.REG for r in arquivo.iter_registros(self.filename)],
+                         ['0000', '0001', '0990'])
+
+
+class TestArquivoAssinado(unittest.TestCase):
+
+    def setUp(self):
+        self.filename = gravar_arquivo(LINHAS)
+        self.sequencial = ArquivoDigital()
+        self.sequencial.readfile(self.filename)
+        with open(self.filename, 'ab') as arquivo:
+            arquivo.write(ASSINATURA)
+
+    def tearDown(self):
+        os.remove(self.filename)
+
+    def test_readfile(self):
+        for opcoes in ({}, {'rapido': True}, {'compacto': True}, {'codificacao': 'auto'},
+                       {'processos': 2}, {'blocos': {'9'}}):
+            arquivo = ArquivoDigital()
+            arquivo.readfile(self.filename, **opcoes)
+            self.assertTrue(arquivo.leitura_completa, opcoes)
+            self.assertEqual(arquivo._registro_encerramento.numero_da_linha, 6)
+            if 'blocos' not in opcoes:
+                self.assertEqual(linhas_lidas(arquivo), linhas_lidas(self.sequencial), opcoes)
+
+    def test_iter_registros(self):
+        self.assertEqual([r.REG for r in ArquivoDigital().iter_registros(self.filename)],
+                         ['0000', '0001', '0990', '9001', '9990', '9999'])
+
+    def test_ler_colunas(self):
+        self.assertEqual(list(ArquivoDigital().ler_colunas(self.filename)),
+                         ['0000', '0001', '0990', '9001', '9990', '9999'])
+
+    def test_contar_linhas(self):
+        self.assertEqual(contar_linhas(self.filename), 6)
+
+    def test_iter_registros_indexados(self):
+        indice = indexar(self.filename, salvar=False)
+        self.assertEqual([r.REG for r in ArquivoDigital().iter_registros_indexados(indice)],
+                         ['0000', '0001', '0990', '9001', '9990', '9999'])
+
+
+class TestLeituraEmParalelo(unittest.TestCase):
+
+    def setUp(self):
+        participantes = ['|0150|P%d|PARTICIPANTE %d|01058|||||||||' % (i, i) for i in range(2000)]
+        linhas = ([ABERTURA, '|0001|0|'] + participantes +
+                  ['|0990|%d|' % (len(participantes) + 3), '|9001|0|', '|9990|2|'])
+        self.filename = gravar_arquivo(linhas + ['|9999|%d|' % (len(linhas) + 1)])
+        self.sequencial = ArquivoDigital()
+        self.sequencial.readfile(self.filename)
+        self.tamanho_do_intervalo = arquivos.TAMANHO_DO_INTERVALO
+
+    def tearDown(self):
+        arquivos.TAMANHO_DO_INTERVALO = self.tamanho_do_intervalo
+        os.remove(self.filename)
+
+    def test_um_intervalo_por_processo(self):
+        paralelo = ArquivoDigital()
+        paralelo.readfile(self.filename, processos=2)
+        self.assertEqual(linhas_lidas(paralelo), linhas_lidas(self.sequencial))
+        self.assertTrue(paralelo.leitura_completa)
+
+    def test_mais_intervalos_que_processos(self):
+        # Intervalos pequenos: muitos mais intervalos que o limite de pendentes.
+        arquivos.TAMANHO_DO_INTERVALO = 1000
+        self.assertGreater(len(arquivos._dividir_em_intervalos(self.filename, 100)),
+                           arquivos.INTERVALOS_POR_PROCESSO * 2)
+        paralelo = ArquivoDigital()
+        paralelo.readfile(self.filename, processos=2)
+        self.assertEqual(linhas_lidas(paralelo), linhas_lidas(self.sequencial))
+        self.assertEqual(paralelo._registro_encerramento.numero_da_linha, 2006)
+
+    def test_arquivo_assinado(self):
+        # Assinatura digital (binária, com quebras de linha) após o 9999,
+        # ocupando vários intervalos.
+        with open(self.filename, 'ab') as arquivo:
+            arquivo.write(b'SBRCAAEPDR\x00\xff\r\n' + b'\xfe\x80\n' * 3000)
+        arquivos.TAMANHO_DO_INTERVALO = 1000
+        for opcoes in ({}, {'rapido': True}, {'compacto': True}):
+            paralelo = ArquivoDigital()
+            paralelo.readfile(self.filename, processos=2, **opcoes)
+            self.assertEqual(linhas_lidas(paralelo), linhas_lidas(self.sequencial))
+            self.assertTrue(paralelo.leitura_completa)
+
+    def test_intervalos_alinhados_as_linhas(self):
+        intervalos = arquivos._dividir_em_intervalos(self.filename, 7)
+        self.assertEqual(intervalos[0][0], 0)
+        self.assertEqual(intervalos[-1][1], os.path.getsize(self.filename))
+        with open(self.filename, 'rb') as arquivo:
+            conteudo = arquivo.read()
+        for (inicio, fim), (proximo, _) in zip(intervalos, intervalos[1:]):
+            self.assertEqual(fim, proximo)
+            self.assertEqual(conteudo[fim - 1:fim], b'\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
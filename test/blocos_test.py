@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+import os
+import sys
+
+from datetime import date
+
+# Necessário para que o arquivo de testes encontre
+test_root = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(test_root))
+
+from sped.blocos import Bloco
+from sped.campos import Campo
+from sped.campos import CampoBool
+from sped.campos import CampoData
+from sped.campos import CampoFixo
+from sped.campos import CampoNumerico
+from sped.campos import CampoRegex
+from sped.erros import CampoObrigatorioError
+from sped.erros import FormatoInvalidoError
+from sped.registros import Registro
+
+
+class RegistroC100(Registro):
+    campos = [
+        CampoFixo(1, 'REG', 'C100'),
+        Campo(2, 'COD_PART'),
+        CampoData(3, 'DT_DOC'),
+        CampoNumerico(4, 'VL_DOC', precisao=2),
+        CampoBool(5, 'IND_ESC'),
+        CampoRegex(6, 'COD_SIT', regex='[0-9]{2}'),
+    ]
+
+
+class RegistroC170(Registro):
+    campos = [
+        CampoFixo(1, 'REG', 'C170'),
+        Campo(2, 'COD_ITEM', obrigatorio=True),
+        CampoRegex(3, 'CST', obrigatorio=True, regex='[0-9]{2}'),
+    ]
+
+
+class TestBlocoExtendRows(unittest.TestCase):
+
+    def setUp(self):
+        self.bloco = Bloco('C')
+
+    def linhas(self):
+        return [registro.as_line() for registro in self.bloco._registros]
+
+    def test_linhas_completas(self):
+        self.bloco.extend_rows(RegistroC100, [('P1', date(2019, 1, 31), 10.5, True, '00')])
+        self.assertEqual(self.linhas(), ['|C100|P1|31012019|10,50|S|00|'])
+
+    def test_linhas_curtas(self):
+        quantidade = self.bloco.extend_rows(RegistroC100, [
+            ('P1', date(2019, 1, 31), 10.5, True, '00'),
+            ('P2', date(2019, 1, 31)),
+            ('P3',),
+        ])
+        self.assertEqual(quantidade, 3)
+        self.assertEqual(self.linhas(), [
+            '|C100|P1|31012019|10,50|S|00|',
+            '|C100|P2|31012019||||',
+            '|C100|P3|||||',
+        ])
+
+    def test_todas_as_linhas_curtas(self):
+        self.bloco.extend_rows(RegistroC100, [('P1',), ('P2', None)])
+        self.assertEqual(self.linhas(), ['|C100|P1|||||', '|C100|P2|||||'])
+
+    def test_none_em_campo_regex(self):
+        self.bloco.extend_rows(RegistroC100, [('P1', None, None, None, None), ('P2', None, 1, False, 10)])
+        self.assertEqual(self.linhas(), ['|C100|P1|||||', '|C100|P2||1|N|10|'])
+
+    def test_campo_regex_invalido(self):
+        with self.assertRaises(FormatoInvalidoError):
+            self.bloco.extend_rows(RegistroC100, [('P1', None, None, None, '1A')])
+        self.assertEqual(self.linhas(), [])
+
+    def test_linha_curta_sem_campo_obrigatorio(self):
+        with self.assertRaises(CampoObrigatorioError):
+            self.bloco.extend_rows(RegistroC170, [('ITEM', '01'), ('ITEM',)])
+        self.assertEqual(self.linhas(), [])
+
+    def test_campo_obrigatorio_ausente_em_todas_as_linhas(self):
+        with self.assertRaises(CampoObrigatorioError):
+            self.bloco.extend_rows(RegistroC170, [('ITEM',), ('ITEM',)])
+        with self.assertRaises(CampoObrigatorioError):
+            self.bloco.extend_rows(RegistroC170, [('ITEM',), ('ITEM', '')])
+        self.assertEqual(self.linhas(), [])
+
+    def test_valores_falsos_nao_texto(self):
+        for valor in (0, False, 0.0):
+            with self.assertRaises(FormatoInvalidoError):
+                self.bloco.extend_rows(RegistroC100, [(valor,)])
+        with self.assertRaises(FormatoInvalidoError):
+            self.bloco.extend_rows(RegistroC170, [(0, '01')])
+        self.assertEqual(self.linhas(), [])
+
+    def test_linha_longa(self):
+        with self.assertRaises(RuntimeError):
+            self.bloco.extend_rows(RegistroC170, [('ITEM', '01', 'X')])
+
+    def test_sem_linhas(self):
+        self.assertEqual(self.bloco.extend_rows(RegistroC100, []), 0)
+        self.assertEqual(self.linhas(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+import os
+import sys
+
+from datetime import date
+from decimal import Decimal
+
+# Necessário para que o arquivo de testes encontre
+test_root = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(test_root))
+
+from sped.campos import Campo
+from sped.campos import CampoAlfanumerico
+from sped.campos import CampoData
+from sped.campos import CampoFixo
+from sped.campos import CampoNumerico
+from sped.colunar import ColunasDoRegistro
+from sped.efd.pis_cofins.registros import RegistroC170
+from sped.erros import CampoObrigatorioError
+from sped.erros import FormatoInvalidoError
+from sped.registros import Registro
+
+
+class RegistroTeste(Registro):
+    campos = [
+        CampoFixo(1, 'REG', 'TEST'),
+        CampoData(2, 'DT_INI'),
+    ]
+
+
+class TestCampoData(unittest.TestCase):
+
+    def test_set_texto_ddmmaaaa(self):
+        registro = RegistroTeste()
+        registro.DT_INI = '01102016'
+        self.assertEqual(registro.DT_INI, date(2016, 10, 1))
+        self.assertEqual(registro.as_line(), '|TEST|01102016|')
+
+    def test_set_date(self):
+        registro = RegistroTeste()
+        registro.DT_INI = date(2019, 1, 31)
+        self.assertEqual(registro.as_line(), '|TEST|31012019|')
+
+    def test_set_vazio(self):
+        registro = RegistroTeste()
+        registro.DT_INI = '01102016'
+        registro.DT_INI = None
+        self.assertIsNone(registro.DT_INI)
+
+    def test_set_texto_invalido(self):
+        registro = RegistroTeste()
+        with self.assertRaises(ValueError):
+            registro.DT_INI = '31022019'
+
+    def test_set_tipo_invalido(self):
+        registro = RegistroTeste()
+        with self.assertRaises(FormatoInvalidoError):
+            registro.DT_INI = 20190131
+
+    def test_codificar_coluna_aceita_texto(self):
+        campo = RegistroTeste.campos[1]
+        self.assertEqual(campo.codificar_coluna([date(2019, 1, 31), '01102016', None]),
+                         ['31012019', '01102016', ''])
+
+
+class TestCodificarColuna(unittest.TestCase):
+
+    def test_valores_nao_texto(self):
+        for campo in (Campo(2, 'COD_ITEM'), CampoAlfanumerico(2, 'DESCR', tamanho=3),
+                      Campo(2, 'COD_ITEM', obrigatorio=True)):
+            for valor in (0, False, 0.0, 5):
+                with self.assertRaises(FormatoInvalidoError):
+                    campo.codificar_coluna(['A', valor])
+
+    def test_vazio(self):
+        self.assertEqual(Campo(2, 'COD_ITEM').codificar_coluna([None, '']), ['', ''])
+        with self.assertRaises(CampoObrigatorioError):
+            Campo(2, 'COD_ITEM', obrigatorio=True).codificar_coluna(['A', None])
+
+    def test_tamanho(self):
+        campo = CampoAlfanumerico(2, 'DESCR', tamanho=3)
+        self.assertEqual(campo.codificar_coluna(['ABCDEF', None]), ['ABC', ''])
+
+
+class TestCampoNumericoSemPrecisao(unittest.TestCase):
+    """Campos da EFD, cujo leiaute não declara a precisão."""
+
+    def setUp(self):
+        self.registro = RegistroC170('|C170|1|ITEM||2,5|UN|1234,56|0|')
+        self.campo = RegistroC170._campos_por_nome['VL_ITEM']
+
+    def test_precisao_nao_declarada(self):
+        self.assertIsNone(self.campo.precisao)
+
+    def test_get_inteiro_com_casas_decimais(self):
+        with self.assertRaises(RuntimeError):
+            self.campo.get_inteiro(self.registro)
+
+    def test_get_inteiro_com_precisao_informada(self):
+        self.assertEqual(self.campo.get_inteiro(self.registro, precisao=2), 123456)
+        self.assertEqual(self.campo.get_inteiro(self.registro, precisao=1), 12346)
+
+    def test_get_inteiro_sem_casas_decimais(self):
+        campo = RegistroC170._campos_por_nome['NUM_ITEM']
+        self.assertEqual(campo.get_inteiro(self.registro), 1)
+
+    def test_decodificar_coluna(self):
+        with self.assertRaises(RuntimeError):
+            self.campo.decodificar_coluna(['10', '1234,56'])
+        self.assertEqual(self.campo.decodificar_coluna(['10', '', '1234,56'], precisao=2),
+                         [1000, None, 123456])
+
+    def test_coluna_inteira(self):
+        tabela = ColunasDoRegistro(RegistroC170)
+        tabela.adicionar(['', 'C170', '1', 'ITEM', '', '2,5', 'UN', '1234,56', '0', ''], 1)
+        tabela.adicionar(['', 'C170', '2', 'ITEM', '', '1', 'UN', '10', '0', ''], 2)
+        with self.assertRaises(RuntimeError):
+            tabela.coluna_inteira('VL_ITEM')
+        self.assertEqual(tabela.coluna_inteira('VL_ITEM', precisao=2), [123456, 1000])
+        self.assertEqual(tabela.coluna_inteira('NUM_ITEM'), [1, 2])
+
+    def test_set_mantem_formato(self):
+        self.registro.VL_ITEM = Decimal('10.4')
+        self.assertEqual(self.registro.VL_ITEM, Decimal('10'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+import os
+import sys
+
+from io import BytesIO
+
+# Necessário para que o arquivo de testes encontre
+test_root = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(test_root))
+
+from sped.escritor import EscritorDeArquivo
+
+
+class TestEscritorDeArquivo(unittest.TestCase):
+
+    def setUp(self):
+        self.destino = BytesIO()
+        self.escritor = EscritorDeArquivo(self.destino)
+        self.escritor.escrever('|0000|EMPRESA|')
+        self.escritor.escrever('|0001|0|')
+        self.escritor.escrever('|0150|P1|')
+
+    def linhas(self):
+        self.escritor.fechar()
+        return self.destino.getvalue().decode('utf-8').split('\r\n')
+
+    def test_registro_apos_encerramento_do_bloco(self):
+        self.escritor.escrever('|0990|3|')
+        with self.assertRaises(RuntimeError):
+            self.escritor.escrever('|0150|P2|')
+
+    def test_registro_de_bloco_anterior(self):
+        self.escritor.escrever('|C100|1|')
+        with self.assertRaises(RuntimeError):
+            self.escritor.escrever('|0150|P2|')
+
+    def test_encerramento_repetido(self):
+        self.escritor.escrever('|0990|3|')
+        with self.assertRaises(RuntimeError):
+            self.escritor.escrever('|0990|3|')
+
+    def test_primeiro_registro_diferente_de_0000(self):
+        escritor = EscritorDeArquivo(BytesIO())
+        with self.assertRaises(RuntimeError):
+            escritor.escrever('|0001|0|')
+
+    def test_registro_apos_fechar(self):
+        self.escritor.fechar()
+        with self.assertRaises(RuntimeError):
+            self.escritor.escrever('|C100|1|')
+
+    def test_encerramento_informado_e_recontado(self):
+        self.escritor.escrever('|0990|99|')
+        self.escritor.escrever('|C100|1|')
+        linhas = self.linhas()
+        self.assertIn('|0990|4|', linhas)
+        self.assertIn('|C990|3|', linhas)
+        self.assertEqual(linhas[-2], '|9999|%d|' % (len(linhas) - 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
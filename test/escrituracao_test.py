@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+import os
+import sys
+
+from io import StringIO
+
+# Necessário para que o arquivo de testes encontre
+test_root = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(test_root))
+
+from sped.escrituracao import ECD
+from sped.escrituracao import Escrituracao
+
+
+class TestEscrituracaoPrepare(unittest.TestCase):
+
+    def setUp(self):
+        self.escrituracao = Escrituracao(ECD, 2017)
+
+    def linhas(self):
+        self.escrituracao.prepare()
+        buff = StringIO()
+        self.escrituracao.write_to(buff)
+        return buff.getvalue().split('\r\n')
+
+    def test_prepare_apos_escrituracao_add(self):
+        self.escrituracao.add(self.escrituracao.registros.RegistroI010())
+        linhas = self.linhas()
+        self.assertIn('|9900|I010|1|', linhas)
+        self.assertIn('|I990|3|', linhas)
+
+    def test_prepare_apos_bloco_add(self):
+        self.escrituracao.blocos['I'].add(self.escrituracao.registros.RegistroI010())
+        linhas = self.linhas()
+        self.assertIn('|9900|I010|1|', linhas)
+        self.assertIn('|I990|3|', linhas)
+
+    def test_prepare_com_bloco_add_e_escrituracao_add(self):
+        self.escrituracao.add(self.escrituracao.registros.RegistroI010())
+        self.escrituracao.blocos['I'].add(self.escrituracao.registros.RegistroI010())
+        linhas = self.linhas()
+        self.assertIn('|9900|I010|2|', linhas)
+        self.assertIn('|I990|4|', linhas)
+
+    def test_prepare_repetido(self):
+        self.escrituracao.add(self.escrituracao.registros.RegistroI010())
+        primeira = self.linhas()
+        self.assertEqual(self.linhas(), primeira)
+        self.assertEqual(primeira[-2], '|9999|%d|' % (len(primeira) - 1))
+
+
+class TestRegistroEscrituracao(unittest.TestCase):
+
+    def test_registro_refere_se_a_sua_escrituracao(self):
+        primeira = Escrituracao(ECD, 2017)
+        segunda = Escrituracao(ECD, 2017)
+        registro = segunda.registros.RegistroI010()
+        segunda.add(registro)
+        self.assertIs(registro.escrituracao, segunda)
+        self.assertIs(primeira.registros.RegistroI010().escrituracao, primeira)
+        self.assertIs(segunda.registro_abertura.escrituracao, segunda)
+        self.assertIs(segunda.blocos['I'].registro_abertura.escrituracao, segunda)
+        self.assertEqual(len(registro.escrituracao.blocos['I']._registros), 1)
+
+    def test_classes_por_escrituracao(self):
+        primeira = Escrituracao(ECD, 2017)
+        segunda = Escrituracao(ECD, 2017)
+        self.assertIsNot(primeira.registros.RegistroI010, segunda.registros.RegistroI010)
+        self.assertIs(primeira.registros.RegistroI010.campos, segunda.registros.RegistroI010.campos)
+        self.assertIsInstance(segunda.registros.RegistroI010(), segunda.registros.Registro)
+        self.assertNotIsInstance(segunda.registros.RegistroI010(), primeira.registros.Registro)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+import os
+import sys
+import tempfile
+
+# Necessário para que o arquivo de testes encontre
+test_root = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(test_root))
+
+from sped.efd.pis_cofins.arquivos import ArquivoDigital
+from sped.indice import EXTENSAO
+from sped.indice import indexar
+
+LINHAS = [
+    b'|0000|006|0||||01012019|31012019|EMPRESA|11111111000191|SP|3550308||00|1|',
+    b'|0001|0|',
+    b'|0990|3|',
+    b'|C001|1|',
+    b'|C990|2|',
+    b'|9001|0|',
+    b'|9990|2|',
+    b'|9999|7|',
+]
+
+# Assinatura digital (binária, com quebras de linha) após o registro 9999.
+ASSINATURA = b'SBRCAAEPDR\x00\xff\r\n|0150|\x01\n\xfe\x80'
+
+
+class TestIndiceDeArquivoAssinado(unittest.TestCase):
+
+    def setUp(self):
+        with tempfile.NamedTemporaryFile('wb', suffix='.txt', delete=False) as arquivo:
+            arquivo.write(b'\r\n'.join(LINHAS) + b'\r\n' + ASSINATURA)
+        self.filename = arquivo.name
+
+    def tearDown(self):
+        for caminho in (self.filename, self.filename + EXTENSAO):
+            if os.path.exists(caminho):
+                os.remove(caminho)
+
+    def test_linhas_apos_9999_nao_indexadas(self):
+        indice = indexar(self.filename)
+        self.assertEqual(len(indice), len(LINHAS))
+        self.assertEqual(indice.registros(), ['0000', '0001', '0990', 'C001', 'C990',
+                                              '9001', '9990', '9999'])
+        self.assertEqual(indice.linha(len(LINHAS)), b'|9999|7|\r')
+        self.assertEqual(indice.numeros_das_linhas('0150'), [])
+
+    def test_indice_carregado(self):
+        indexar(self.filename)
+        self.assertEqual(len(indexar(self.filename)), len(LINHAS))
+
+    def test_iter_registros_indexados(self):
+        indice = indexar(self.filename, salvar=False)
+        arquivo = ArquivoDigital()
+        registros = list(arquivo.iter_registros_indexados(indice))
+        self.assertEqual([registro.REG for registro in registros],
+                         ['0000', '0001', '0990', 'C001', 'C990', '9001', '9990', '9999'])
+        self.assertEqual(registros[-1].numero_da_linha, len(LINHAS))
+
+
+if __name__ == '__main__':
+    unittest.main()